@@ -1,7 +1,9 @@
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.engine import make_url
 
 from alembic import context
 from db import Base, engine
@@ -10,6 +12,15 @@ from db import Base, engine
 # access to the values within the .ini file in use.
 config = context.config
 
+# DATABASE_URL (a mesma usada pela API) tem prioridade sobre o sqlalchemy.url do alembic.ini;
+# o driver assíncrono é trocado pelo síncrono padrão do banco
+if os.getenv("DATABASE_URL"):
+    database_url = make_url(os.getenv("DATABASE_URL"))
+    config.set_main_option(
+        "sqlalchemy.url",
+        database_url.set(drivername=database_url.get_backend_name()).render_as_string(hide_password=False).replace("%", "%%")
+    )
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
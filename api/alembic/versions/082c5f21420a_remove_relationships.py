@@ -20,12 +20,13 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_index('ix_ForecastsHeader_id', table_name='ForecastsHeader')
-    op.drop_table('ForecastsHeader')
-    op.drop_index('ix_Forecasts_id', table_name='Forecasts')
-    op.drop_table('Forecasts')
-    op.drop_index('ix_Units_id', table_name='Units')
-    op.drop_table('Units')
+    # Num banco novo as tabelas ainda não existem; elas são criadas em f27c4b581256
+    op.drop_index('ix_ForecastsHeader_id', table_name='ForecastsHeader', if_exists=True)
+    op.drop_table('ForecastsHeader', if_exists=True)
+    op.drop_index('ix_Forecasts_id', table_name='Forecasts', if_exists=True)
+    op.drop_table('Forecasts', if_exists=True)
+    op.drop_index('ix_Units_id', table_name='Units', if_exists=True)
+    op.drop_table('Units', if_exists=True)
     # ### end Alembic commands ###
 
 
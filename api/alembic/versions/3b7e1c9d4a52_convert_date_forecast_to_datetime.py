@@ -0,0 +1,107 @@
+"""convert date_forecast to datetime
+
+Revision ID: 3b7e1c9d4a52
+Revises: f27c4b581256
+Create Date: 2024-12-09 10:12:41.803215
+
+"""
+from typing import Sequence, Union
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e1c9d4a52'
+down_revision: Union[str, None] = 'f27c4b581256'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# meteoblue envia "YYYY-MM-DD HH:MM"; também são aceitos segundos e o separador "T" do ISO
+DATE_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S")
+
+
+def parse_date(value: str) -> datetime:
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format)
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def read_column(source: sa.Column, convert) -> list:
+    """
+    Lê `source` de Forecasts e converte cada valor em Python. Falha se algum valor não puder
+    ser convertido, em vez de deixá-lo nulo, antes de qualquer mudança no schema.
+    """
+    forecasts = sa.table('Forecasts', sa.column('id', sa.Integer()), source)
+    rows = op.get_bind().execute(sa.select(forecasts.c.id, source).where(source.is_not(None))).all()
+
+    values, invalid = [], []
+    for row_id, value in rows:
+        try:
+            values.append({"row_id": row_id, "value": convert(value)})
+        except ValueError:
+            invalid.append((row_id, value))
+    if invalid:
+        raise RuntimeError(
+            f"{len(invalid)} linha(s) de Forecasts com date_forecast em formato desconhecido, "
+            f"por exemplo {invalid[:5]}"
+        )
+    return values
+
+
+def write_column(target: sa.Column, values: list) -> None:
+    """
+    Grava `values` em `target` com parâmetros tipados, para que o dialeto (SQLite ou
+    Postgres) converta para o formato da coluna.
+    """
+    if not values:
+        return
+    forecasts = sa.table('Forecasts', sa.column('id', sa.Integer()), target)
+    op.get_bind().execute(
+        forecasts.update()
+        .where(forecasts.c.id == sa.bindparam("row_id"))
+        .values({target.name: sa.bindparam("value", type_=target.type)}),
+        values,
+    )
+
+
+def upgrade() -> None:
+    values = read_column(sa.column('date_forecast', sa.String()), parse_date)
+
+    # a recriação da tabela pelo batch faria CAST(... AS DATETIME), que no SQLite
+    # transforma o texto em número; por isso os dados são copiados para uma coluna nova
+    with op.batch_alter_table('Forecasts') as batch_op:
+        batch_op.add_column(sa.Column('date_forecast_dt', sa.DateTime(), nullable=True))
+
+    write_column(sa.column('date_forecast_dt', sa.DateTime()), values)
+
+    with op.batch_alter_table('Forecasts') as batch_op:
+        batch_op.drop_column('date_forecast')
+
+    with op.batch_alter_table('Forecasts') as batch_op:
+        batch_op.alter_column('date_forecast_dt', new_column_name='date_forecast')
+
+    op.create_index('ix_Forecasts_date_forecast', 'Forecasts', ['date_forecast'], unique=False)
+
+
+def downgrade() -> None:
+    values = read_column(
+        sa.column('date_forecast', sa.DateTime()), lambda value: value.strftime("%Y-%m-%d %H:%M")
+    )
+    op.drop_index('ix_Forecasts_date_forecast', table_name='Forecasts')
+
+    with op.batch_alter_table('Forecasts') as batch_op:
+        batch_op.add_column(sa.Column('date_forecast_str', sa.VARCHAR(), nullable=True))
+
+    write_column(sa.column('date_forecast_str', sa.String()), values)
+
+    with op.batch_alter_table('Forecasts') as batch_op:
+        batch_op.drop_column('date_forecast')
+
+    with op.batch_alter_table('Forecasts') as batch_op:
+        batch_op.alter_column('date_forecast_str', new_column_name='date_forecast')
@@ -0,0 +1,36 @@
+"""store header coordinates as float
+
+Revision ID: 7a4f2e6b1d90
+Revises: c5d8a1f3e9b7
+Create Date: 2024-12-11 09:47:22.530918
+
+As coordenadas do cabeçalho do meteoblue são fracionárias (por exemplo -3.117), mas as
+colunas foram criadas como INTEGER. O SQLite guarda o valor como veio, então o local.db
+não perdia nada; num banco com tipos estritos, como o PostgreSQL do DATABASE_URL, elas
+seriam arredondadas para o grau inteiro e a restrição única (modelrun, latitude,
+longitude) juntaria localidades diferentes da mesma rodada. No SQLite a revisão só
+recria a tabela com o tipo correto.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4f2e6b1d90'
+down_revision: Union[str, None] = 'c5d8a1f3e9b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('ForecastsHeader') as batch_op:
+        batch_op.alter_column('latitude', existing_type=sa.INTEGER(), type_=sa.Float(), existing_nullable=True)
+        batch_op.alter_column('longitude', existing_type=sa.INTEGER(), type_=sa.Float(), existing_nullable=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('ForecastsHeader') as batch_op:
+        batch_op.alter_column('latitude', existing_type=sa.Float(), type_=sa.INTEGER(), existing_nullable=True)
+        batch_op.alter_column('longitude', existing_type=sa.Float(), type_=sa.INTEGER(), existing_nullable=True)
@@ -0,0 +1,55 @@
+"""add unique constraints for upserts
+
+Revision ID: c5d8a1f3e9b7
+Revises: 3b7e1c9d4a52
+Create Date: 2024-12-10 18:31:05.117402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d8a1f3e9b7'
+down_revision: Union[str, None] = '3b7e1c9d4a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Remove apenas as duplicatas que impediriam a criação das restrições, mantendo a
+    # linha mais recente. Linhas sem state_id ficam para o compact_db.py.
+    op.execute(
+        "DELETE FROM \"Forecasts\" WHERE state_id IS NOT NULL AND id NOT IN ("
+        "SELECT max(id) FROM \"Forecasts\" WHERE state_id IS NOT NULL "
+        "GROUP BY state_id, modelrun, date_forecast)"
+    )
+    op.execute(
+        "DELETE FROM \"ForecastsHeader\" WHERE id NOT IN ("
+        "SELECT max(id) FROM \"ForecastsHeader\" GROUP BY modelrun, latitude, longitude)"
+    )
+    op.execute(
+        "DELETE FROM \"Units\" WHERE id NOT IN (SELECT max(id) FROM \"Units\" GROUP BY modelrun)"
+    )
+
+    with op.batch_alter_table('Forecasts') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_Forecasts_state_modelrun_date', ['state_id', 'modelrun', 'date_forecast']
+        )
+    with op.batch_alter_table('ForecastsHeader') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_ForecastsHeader_modelrun_location', ['modelrun', 'latitude', 'longitude']
+        )
+    with op.batch_alter_table('Units') as batch_op:
+        batch_op.create_unique_constraint('uq_Units_modelrun', ['modelrun'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('Units') as batch_op:
+        batch_op.drop_constraint('uq_Units_modelrun', type_='unique')
+    with op.batch_alter_table('ForecastsHeader') as batch_op:
+        batch_op.drop_constraint('uq_ForecastsHeader_modelrun_location', type_='unique')
+    with op.batch_alter_table('Forecasts') as batch_op:
+        batch_op.drop_constraint('uq_Forecasts_state_modelrun_date', type_='unique')
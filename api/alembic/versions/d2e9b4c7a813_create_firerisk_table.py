@@ -0,0 +1,42 @@
+"""create FireRisk table
+
+Revision ID: d2e9b4c7a813
+Revises: 7a4f2e6b1d90
+Create Date: 2024-12-12 14:05:48.271663
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2e9b4c7a813'
+down_revision: Union[str, None] = '7a4f2e6b1d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('FireRisk',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('state_id', sa.Integer(), nullable=False),
+    sa.Column('date_forecast', sa.DateTime(), nullable=False),
+    sa.Column('modelrun', sa.String(), nullable=False),
+    sa.Column('result', sa.Integer(), nullable=False),
+    sa.Column('numero_dias_sem_chuva', sa.Integer(), nullable=True),
+    sa.Column('precipitation', sa.Float(), nullable=True),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['state_id'], ['State.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('state_id', 'date_forecast', name='uq_FireRisk_state_date')
+    )
+    op.create_index('ix_FireRisk_id', 'FireRisk', ['id'], unique=False)
+    op.create_index('ix_FireRisk_date_forecast', 'FireRisk', ['date_forecast'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_FireRisk_date_forecast', table_name='FireRisk')
+    op.drop_index('ix_FireRisk_id', table_name='FireRisk')
+    op.drop_table('FireRisk')
@@ -19,9 +19,72 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    # As tabelas eram criadas pelo init_db.py (create_all) e as revisões anteriores não as
+    # criam. Num banco novo elas são criadas aqui como estavam neste ponto, para o
+    # `alembic upgrade head` montar o banco inteiro; bancos existentes não mudam.
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    if 'State' not in existing:
+        op.create_table('State',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('lat', sa.Float(), nullable=False),
+        sa.Column('lon', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_State_id', 'State', ['id'], unique=False)
+    if 'Forecasts' not in existing:
+        op.create_table('Forecasts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('modelrun', sa.String(), nullable=False),
+        sa.Column('date_forecast', sa.String(), nullable=True),
+        sa.Column('windspeed', sa.Float(), nullable=True),
+        sa.Column('temperature', sa.Float(), nullable=True),
+        sa.Column('precipitation_probability', sa.Float(), nullable=True),
+        sa.Column('convective_precipitation', sa.Float(), nullable=True),
+        sa.Column('rainspot', sa.String(), nullable=True),
+        sa.Column('pictocode', sa.Float(), nullable=True),
+        sa.Column('felttemperature', sa.Float(), nullable=True),
+        sa.Column('precipitation', sa.Float(), nullable=True),
+        sa.Column('isdaylight', sa.Float(), nullable=True),
+        sa.Column('uvindex', sa.Float(), nullable=True),
+        sa.Column('relativehumidity', sa.Float(), nullable=True),
+        sa.Column('sealevelpressure', sa.Float(), nullable=True),
+        sa.Column('winddirection', sa.Float(), nullable=True),
+        sa.Column('state_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['state_id'], ['State.id']),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_Forecasts_id', 'Forecasts', ['id'], unique=False)
+    if 'ForecastsHeader' not in existing:
+        op.create_table('ForecastsHeader',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('modelrun', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('height', sa.Integer(), nullable=True),
+        sa.Column('timezone_abbrevation', sa.String(), nullable=True),
+        sa.Column('latitude', sa.Integer(), nullable=True),
+        sa.Column('modelrun_utc', sa.String(), nullable=True),
+        sa.Column('longitude', sa.Integer(), nullable=True),
+        sa.Column('utc_timeoffset', sa.Integer(), nullable=True),
+        sa.Column('generation_time_ms', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_ForecastsHeader_id', 'ForecastsHeader', ['id'], unique=False)
+    if 'Units' not in existing:
+        op.create_table('Units',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('modelrun', sa.String(), nullable=False),
+        sa.Column('precipitation', sa.String(), nullable=True),
+        sa.Column('windspeed', sa.String(), nullable=True),
+        sa.Column('precipitation_probability', sa.String(), nullable=True),
+        sa.Column('relativehumidity', sa.String(), nullable=True),
+        sa.Column('temperature', sa.String(), nullable=True),
+        sa.Column('time', sa.String(), nullable=True),
+        sa.Column('pressure', sa.String(), nullable=True),
+        sa.Column('winddirection', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_Units_id', 'Units', ['id'], unique=False)
 
 
 def downgrade() -> None:
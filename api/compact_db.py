@@ -0,0 +1,96 @@
+"""
+Compacta um banco criado antes das restrições únicas de Forecasts, ForecastsHeader e Units:
+associa a uma localidade (State) as previsões antigas sem state_id cuja rodada do modelo
+pertence a uma única coordenada, remove as linhas duplicadas mantendo a mais recente e
+executa VACUUM. Pode ser executado mais de uma vez.
+"""
+import asyncio
+from sqlalchemy import text
+from db import engine
+
+TABLES = ["Forecasts", "ForecastsHeader", "Units", "State"]
+
+
+async def count_rows(conn):
+    return {
+        table: (await conn.execute(text(f'SELECT count(*) FROM "{table}"'))).scalar()
+        for table in TABLES
+    }
+
+
+async def assign_states(conn):
+    """
+    Preenche state_id das previsões antigas a partir da coordenada do cabeçalho da mesma rodada.
+    Rodadas gravadas para mais de uma coordenada são ambíguas e ficam como estão.
+    """
+    result = await conn.execute(text(
+        'SELECT modelrun, min(latitude), min(longitude) FROM "ForecastsHeader" '
+        'WHERE modelrun IN (SELECT DISTINCT modelrun FROM "Forecasts" WHERE state_id IS NULL) '
+        'GROUP BY modelrun HAVING count(DISTINCT latitude) = 1 AND count(DISTINCT longitude) = 1'
+    ))
+    for modelrun, lat, lon in result.all():
+        state_id = (await conn.execute(
+            text('SELECT id FROM "State" WHERE round(lat, 2) = round(:lat, 2) '
+                 'AND round(lon, 2) = round(:lon, 2) ORDER BY id LIMIT 1'),
+            {"lat": lat, "lon": lon},
+        )).scalar()
+        if state_id is None:
+            state_id = (await conn.execute(
+                text('INSERT INTO "State" (name, lat, lon) VALUES (:name, :lat, :lon) RETURNING id'),
+                {"name": f"{lat}, {lon}", "lat": lat, "lon": lon},
+            )).scalar()
+
+        # Mantém a linha mais recente de cada horário antes de atribuir a localidade
+        await conn.execute(
+            text('DELETE FROM "Forecasts" WHERE modelrun = :modelrun AND state_id IS NULL AND id NOT IN ('
+                 'SELECT max(id) FROM "Forecasts" WHERE modelrun = :modelrun AND state_id IS NULL '
+                 'GROUP BY date_forecast)'),
+            {"modelrun": modelrun},
+        )
+        # Horários que a localidade já tem para essa rodada são duplicatas e são descartados
+        await conn.execute(
+            text('UPDATE OR IGNORE "Forecasts" SET state_id = :state_id '
+                 'WHERE modelrun = :modelrun AND state_id IS NULL'),
+            {"state_id": state_id, "modelrun": modelrun},
+        )
+        await conn.execute(
+            text('DELETE FROM "Forecasts" WHERE modelrun = :modelrun AND state_id IS NULL'),
+            {"modelrun": modelrun},
+        )
+
+
+async def remove_duplicates(conn):
+    await conn.execute(text(
+        'DELETE FROM "Forecasts" WHERE state_id IS NOT NULL AND id NOT IN ('
+        'SELECT max(id) FROM "Forecasts" WHERE state_id IS NOT NULL '
+        'GROUP BY state_id, modelrun, date_forecast)'
+    ))
+    await conn.execute(text(
+        'DELETE FROM "ForecastsHeader" WHERE id NOT IN ('
+        'SELECT max(id) FROM "ForecastsHeader" GROUP BY modelrun, latitude, longitude)'
+    ))
+    await conn.execute(text(
+        'DELETE FROM "Units" WHERE id NOT IN (SELECT max(id) FROM "Units" GROUP BY modelrun)'
+    ))
+
+
+async def compact_db():
+    if engine.dialect.name != "sqlite":
+        print("compact_db.py só é suportado para bancos SQLite.")
+        return
+
+    async with engine.begin() as conn:
+        before = await count_rows(conn)
+        await assign_states(conn)
+        await remove_duplicates(conn)
+        after = await count_rows(conn)
+
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM"))
+
+    for table in TABLES:
+        print(f"{table}: {before[table]} -> {after[table]} linhas")
+
+if __name__ == "__main__":
+    asyncio.run(compact_db())
@@ -1,87 +1,231 @@
 
 from dotenv import load_dotenv
 import os
-import requests
+import time
+import asyncio
+import httpx
+from datetime import datetime
+from sqlalchemy import func, cast, Numeric
+from sqlalchemy.future import select
 from sqlalchemy.orm import Session
-from db import SessionLocal
-from models import ApiForecastHeader, Units, ApiForecastItem
+from db import SessionLocal, upsert
+from models import ApiForecastHeader, Units, ApiForecastItem, State
+from helpers.drySpellIndex import DrySpellIndex
+from helpers.forecastCache import ForecastCache
+from metrics import UPSTREAM_LATENCY, record_stage
 
 load_dotenv()
 API_SECRET = os.getenv("API_KEY")
 SHARED_SECRET = os.getenv("API_SHARED_SECRET")
 API_URL = os.getenv("API_URL")
 
+FORECAST_FIELDS = [
+    "windspeed",
+    "temperature",
+    "precipitation_probability",
+    "convective_precipitation",
+    "rainspot",
+    "pictocode",
+    "felttemperature",
+    "precipitation",
+    "isdaylight",
+    "uvindex",
+    "relativehumidity",
+    "sealevelpressure",
+    "winddirection",
+]
+
 
 
 class ClimateApi:
-    def __init__(self):
+    def __init__(self, base_url: str = None, max_connections: int = 10, max_concurrency: int = 4, timeout: float = 10.0):
         self.api_secret = API_SECRET
         self.shared_secret = SHARED_SECRET
+        # API_URL permite apontar para um servidor local que imita o pacote basic-1h
+        self.base_url = (base_url or API_URL or "https://my.meteoblue.com").rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        # Buscas em andamento por coordenada arredondada, compartilhadas por quem pedir a mesma
+        self._inflight = {}
+        self.cache = ForecastCache()
 
     def __get_signature(self, query: str) -> str:
         import hashlib
         import hmac
         return hmac.new(self.shared_secret.encode(), query.encode(), hashlib.sha256).hexdigest()
 
-    def fetch_forecast(self, lat: float, lon: float, expire: int = 1924948800) -> dict:
+    def __get_url(self, lat: float, lon: float, expire: int) -> str:
         query = f"/packages/basic-1h?lat={lat}&lon={lon}&apikey={self.api_secret}&expire={expire}"
         signature = self.__get_signature(query)
-        url = f"https://my.meteoblue.com{query}&sig={signature}"
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return f"{self.base_url}{query}&sig={signature}"
 
-    async def save_forecast_to_db(self, data: dict, lat: float, lon: float):
-        async with SessionLocal() as session:
-            header = ApiForecastHeader(
-                modelrun=data["metadata"].get("modelrun_updatetime_utc"),
-                name=data["metadata"].get("name"),
-                height=data["metadata"].get("height"),
-                timezone_abbrevation=data["metadata"].get("timezone_abbrevation"),
-                latitude=lat,
-                longitude=lon,
-                modelrun_utc=data["metadata"].get("modelrun_utc"),
-                utc_timeoffset=data["metadata"].get("utc_timeoffset"),
-                generation_time_ms=data["metadata"].get("generation_time_ms")
-            )
-            session.add(header)
-            await session.commit()
-            session.refresh(header)
-            
-            units = Units(
-                modelrun=data["metadata"].get("modelrun_updatetime_utc"),
-                precipitation=data["units"].get("precipitation"),
-                windspeed=data["units"].get("windspeed"),
-                precipitation_probability=data["units"].get("precipitation_probability"),
-                relativehumidity=data["units"].get("relativehumidity"),
-                temperature=data["units"].get("temperature"),
-                time=data["units"].get("time"),
-                pressure=data["units"].get("pressure"),
-                winddirection=data["units"].get("winddirection")
+    @staticmethod
+    def __record_latency(started: float, status_code: int):
+        seconds = time.perf_counter() - started
+        UPSTREAM_LATENCY.observe(seconds, status=status_code)
+        record_stage("upstream", seconds)
+
+    def __get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
             )
-            session.add(units)
-
-            await session.commit()
-            session.refresh(units)
-
-            for i, time in enumerate(data["data_1h"]["time"]):
-                forecast_item = ApiForecastItem(
-                    modelrun=data["metadata"].get("modelrun_updatetime_utc"),
-                    date_forecast=time,
-                    windspeed=data["data_1h"].get("windspeed", [None])[i],
-                    temperature=data["data_1h"].get("temperature", [None])[i],
-                    precipitation_probability=data["data_1h"].get("precipitation_probability", [None])[i],
-                    convective_precipitation=data["data_1h"].get("convective_precipitation", [None])[i],
-                    rainspot=data["data_1h"].get("rainspot", [None])[i],
-                    pictocode=data["data_1h"].get("pictocode", [None])[i],
-                    felttemperature=data["data_1h"].get("felttemperature", [None])[i],
-                    precipitation=data["data_1h"].get("precipitation", [None])[i],
-                    isdaylight=data["data_1h"].get("isdaylight", [None])[i],
-                    uvindex=data["data_1h"].get("uvindex", [None])[i],
-                    relativehumidity=data["data_1h"].get("relativehumidity", [None])[i],
-                    sealevelpressure=data["data_1h"].get("sealevelpressure", [None])[i],
-                    winddirection=data["data_1h"].get("winddirection", [None])[i]
+        return self._client
+
+    async def fetch_forecast_async(self, lat: float, lon: float, expire: int = 1924948800) -> dict:
+        """
+        Busca a previsão sem bloquear o event loop, reaproveitando as conexões do pool.
+
+        Pedidos simultâneos para a mesma coordenada (arredondada como no cache) esperam a
+        mesma busca, em vez de cada um ir à meteoblue. O semáforo limita quantas requisições
+        ficam em andamento ao mesmo tempo.
+        """
+        cached = self.cache.get(lat, lon)
+        if cached is not None:
+            return cached
+
+        key = self.cache.key(lat, lon)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self.__fetch(lat, lon, expire))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # O cancelamento de quem espera não cancela a busca dos demais
+        return await asyncio.shield(task)
+
+    async def __fetch(self, lat: float, lon: float, expire: int) -> dict:
+        async with self._semaphore:
+            started = time.perf_counter()
+            response = await self.__get_client().get(self.__get_url(lat, lon, expire))
+            self.__record_latency(started, response.status_code)
+            response.raise_for_status()
+            data = response.json()
+        self.cache.put(lat, lon, data)
+        return data
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __resolve_state_id(self, session, lat: float, lon: float, name: str = None) -> int:
+        """
+        Localidade (linha de State) com as mesmas coordenadas arredondadas; cria uma se não existir.
+        """
+        key_lat, key_lon = self.cache.key(lat, lon)
+        result = await session.execute(
+            select(State.id)
+            .filter(func.round(cast(State.lat, Numeric), self.cache.precision) == key_lat)
+            .filter(func.round(cast(State.lon, Numeric), self.cache.precision) == key_lon)
+            .order_by(State.id)
+            .limit(1)
+        )
+        state_id = result.scalar()
+        if state_id is None:
+            state = State(name=name or f"{lat}, {lon}", lat=lat, lon=lon)
+            session.add(state)
+            await session.flush()
+            state_id = state.id
+        return state_id
+
+    async def save_forecast_to_db(self, data: dict, lat: float, lon: float, state_id: int = None):
+        started = time.perf_counter()
+        modelrun = data["metadata"].get("modelrun_updatetime_utc")
+
+        # Transpõe as séries de data_1h uma única vez em linhas prontas para o executemany
+        data_1h = data["data_1h"]
+        total = len(data_1h["time"])
+        series = [
+            [datetime.strptime(value, "%Y-%m-%d %H:%M") for value in data_1h["time"]],
+            *(data_1h.get(field) or [None] * total for field in FORECAST_FIELDS),
+        ]
+        keys = ["date_forecast", *FORECAST_FIELDS]
+        forecast_rows = [dict(zip(keys, values), modelrun=modelrun) for values in zip(*series)]
+
+        key_lat, key_lon = self.cache.key(lat, lon)
+        async with SessionLocal() as session:
+            async with session.begin():
+                # A mesma rodada do modelo para a mesma localidade já foi gravada
+                result = await session.execute(
+                    select(ApiForecastHeader.id)
+                    .filter(ApiForecastHeader.modelrun == modelrun)
+                    .filter(func.round(cast(ApiForecastHeader.latitude, Numeric), self.cache.precision) == key_lat)
+                    .filter(func.round(cast(ApiForecastHeader.longitude, Numeric), self.cache.precision) == key_lon)
+                    .limit(1)
                 )
-                session.add(forecast_item)
+                if result.first() is not None:
+                    print(f"Previsão {modelrun} para ({lat}, {lon}) já gravada, ignorando.")
+                    return {
+                        "rows": 0,
+                        "seconds": round(time.perf_counter() - started, 4),
+                        "rows_per_second": None,
+                        "skipped": True,
+                    }
+
+                if state_id is None:
+                    state_id = await self.__resolve_state_id(session, lat, lon, data["metadata"].get("name"))
+                for row in forecast_rows:
+                    row["state_id"] = state_id
+
+                await session.execute(
+                    upsert(ApiForecastHeader)
+                    .values(
+                        modelrun=modelrun,
+                        name=data["metadata"].get("name"),
+                        height=data["metadata"].get("height"),
+                        timezone_abbrevation=data["metadata"].get("timezone_abbrevation"),
+                        latitude=lat,
+                        longitude=lon,
+                        modelrun_utc=data["metadata"].get("modelrun_utc"),
+                        utc_timeoffset=data["metadata"].get("utc_timeoffset"),
+                        generation_time_ms=data["metadata"].get("generation_time_ms")
+                    )
+                    .on_conflict_do_nothing(index_elements=["modelrun", "latitude", "longitude"])
+                )
+                await session.execute(
+                    upsert(Units)
+                    .values(
+                        modelrun=modelrun,
+                        precipitation=data["units"].get("precipitation"),
+                        windspeed=data["units"].get("windspeed"),
+                        precipitation_probability=data["units"].get("precipitation_probability"),
+                        relativehumidity=data["units"].get("relativehumidity"),
+                        temperature=data["units"].get("temperature"),
+                        time=data["units"].get("time"),
+                        pressure=data["units"].get("pressure"),
+                        winddirection=data["units"].get("winddirection")
+                    )
+                    .on_conflict_do_nothing(index_elements=["modelrun"])
+                )
+                if forecast_rows:
+                    statement = upsert(ApiForecastItem.__table__)
+                    await session.execute(
+                        statement.on_conflict_do_update(
+                            index_elements=["state_id", "modelrun", "date_forecast"],
+                            set_={field: statement.excluded[field] for field in FORECAST_FIELDS},
+                        ),
+                        forecast_rows,
+                    )
+
+        DrySpellIndex.add(
+            (state_id, modelrun, row["date_forecast"], row["precipitation"]) for row in forecast_rows
+        )
 
-            await session.commit()
\ No newline at end of file
+        elapsed = time.perf_counter() - started
+        stats = {
+            "rows": len(forecast_rows),
+            "seconds": round(elapsed, 4),
+            "rows_per_second": round(len(forecast_rows) / elapsed, 1) if elapsed > 0 else None,
+            "skipped": False,
+            "state_id": state_id,
+            "first_forecast": min(row["date_forecast"] for row in forecast_rows) if forecast_rows else None,
+        }
+        print(f"Previsões gravadas: {stats['rows']} linhas em {stats['seconds']}s ({stats['rows_per_second']} linhas/s)")
+        return stats
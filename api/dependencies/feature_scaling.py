@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+import pandas as pd
+
+DEFAULT_PARAMS_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "results", "preprocess_params.json")
+)
+SCALED_COLUMNS = ["lat", "lon", "numero_dias_sem_chuva", "precipitacao"]
+
+
+class FeatureScalingError(Exception):
+    pass
+
+
+class FeatureScaling:
+    """
+    Normaliza (Min-Max) as features das requisições com os parâmetros usados nos dados de
+    treino (`fit_preprocess` em main/preprocess_data.py, salvos por estado por main/train.py
+    em results/preprocess_params.json).
+
+    Cada estado foi normalizado com os próprios limites, então cada ponto usa os parâmetros
+    do estado cuja faixa de lat/lon o contém (o menor, se houver mais de um; o mais próximo,
+    se não houver nenhum).
+    """
+
+    def __init__(self, params_path: str = None):
+        self.params_path = params_path or os.getenv("PREPROCESS_PARAMS_PATH", DEFAULT_PARAMS_PATH)
+        self._states = None
+        self._lock = threading.Lock()
+
+    def load(self, params_path: str = None):
+        path = params_path or self.params_path
+        try:
+            with open(path, encoding="utf-8") as f:
+                states = json.load(f)["estados"]
+        except FileNotFoundError:
+            raise FeatureScalingError(
+                f"Preprocessing parameters not found at {path}; run main/train.py to generate them"
+            )
+        if not states:
+            raise FeatureScalingError(f"No preprocessing parameters in {path}")
+
+        with self._lock:
+            self.params_path = path
+            self._states = states
+        return states
+
+    def _get_states(self):
+        if self._states is None:
+            self.load()
+        return self._states
+
+    @staticmethod
+    def _distance(params, lat, lon):
+        # Zero dentro da faixa de lat/lon do estado; fora dela, o quanto o ponto está afastado
+        minimo, maximo = params["minimo"], params["maximo"]
+        dlat = max(minimo["lat"] - lat, 0, lat - maximo["lat"])
+        dlon = max(minimo["lon"] - lon, 0, lon - maximo["lon"])
+        return dlat * dlat + dlon * dlon
+
+    @staticmethod
+    def _area(params):
+        minimo, maximo = params["minimo"], params["maximo"]
+        return (maximo["lat"] - minimo["lat"]) * (maximo["lon"] - minimo["lon"])
+
+    def state_for(self, lat: float, lon: float) -> str:
+        states = self._get_states()
+        return min(
+            states,
+            key=lambda sigla: (self._distance(states[sigla], lat, lon), self._area(states[sigla])),
+        )
+
+    def transform(self, input_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Retorna uma cópia de `input_data` com SCALED_COLUMNS normalizadas como no treino.
+        """
+        states = self._get_states()
+        input_data = input_data.copy()
+        siglas = [self.state_for(lat, lon) for lat, lon in zip(input_data["lat"], input_data["lon"])]
+
+        for column in SCALED_COLUMNS:
+            minimo = pd.Series([states[sigla]["minimo"][column] for sigla in siglas], index=input_data.index)
+            maximo = pd.Series([states[sigla]["maximo"][column] for sigla in siglas], index=input_data.index)
+            scale = maximo - minimo
+            # Como no MinMaxScaler, uma coluna constante fica com escala 1
+            scale = scale.where(scale != 0, 1)
+            input_data[column] = (input_data[column].astype(float) - minimo) / scale
+        return input_data
+
+
+feature_scaling = FeatureScaling()
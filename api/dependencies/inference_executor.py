@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dependencies.model_registry import model_registry
+from metrics import MODEL_BATCH_SIZE, record_stage
+
+
+class InferenceBusyError(Exception):
+    pass
+
+
+def _predict_many(model, input_data):
+    # O worker de um pool de processos recebe só o caminho do arquivo, que carrega uma vez
+    if isinstance(model, str):
+        model = model_registry.get(model)
+    return model.predict_many(input_data)
+
+
+def _release_acquired(semaphore, acquire):
+    # Devolve a vaga de um acquire que terminou depois de quem o esperava desistir
+    if not acquire.cancelled() and acquire.exception() is None:
+        semaphore.release()
+
+
+class InferenceExecutor:
+    """
+    Executa Model.predict_many fora do event loop, num pool de threads ou de processos.
+
+    No máximo `max_pending` chamadas ficam em execução ou na fila ao mesmo tempo. As demais
+    esperam uma vaga por até `queue_timeout` segundos e então recebem InferenceBusyError,
+    para que uma rajada de chamadas grandes não acumule trabalho sem limite no pool.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 2, max_pending: int = 8, queue_timeout: float = 30.0):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = None
+        self._semaphore = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            pool = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.max_workers)
+        return self._executor
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        return self._semaphore
+
+    async def predict_many(self, input_data) -> list:
+        # Resolvido aqui para que a troca de MODEL_PATH chegue aos workers de processo; as
+        # threads recebem a própria instância, que continua válida mesmo se for trocada
+        model = model_registry.get()
+        target = model.model_path if self.kind == "process" else model
+        semaphore = self._get_semaphore()
+        started = time.perf_counter()
+        # Com o shield, só este trecho cancela o acquire; sem ele o wait_for poderia expirar ou ser
+        # cancelado logo depois de o acquire obter a vaga, que nunca seria devolvida
+        acquire = asyncio.ensure_future(semaphore.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(acquire), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            acquire.cancel()
+            acquire.add_done_callback(lambda done: _release_acquired(semaphore, done))
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise InferenceBusyError(f"Inference queue is full ({self.max_pending} pending)")
+        finally:
+            record_stage("inference_queue", time.perf_counter() - started)
+
+        self.pending += 1
+        MODEL_BATCH_SIZE.observe(len(input_data))
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), _predict_many, target, input_data)
+        finally:
+            record_stage("predict", time.perf_counter() - started)
+            self.pending -= 1
+            self.completed += 1
+            semaphore.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "queue_timeout": self.queue_timeout,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+inference_executor = InferenceExecutor(
+    kind=os.getenv("INFERENCE_EXECUTOR", "thread"),
+    max_workers=int(os.getenv("INFERENCE_WORKERS", "2")),
+    max_pending=int(os.getenv("INFERENCE_MAX_PENDING", "8")),
+    queue_timeout=float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "30")),
+)
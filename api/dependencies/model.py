@@ -1,17 +1,25 @@
-import pickle
-import pandas as pd
 import os
+import time
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
 from joblib import load
 
 load_dotenv()
 class Model:
-    def __init__(self, model_path = os.getenv("MODEL_PATH")):
+    """
+    Classificador treinado. Arquivos `.onnx` rodam no ONNX Runtime (CPU), sem importar as
+    bibliotecas de treino; qualquer outro caminho é carregado com joblib.
+    """
+    def __init__(self, model_path = os.getenv("MODEL_PATH"), backend = None):
         self.model_path =  model_path 
+        self.backend = backend or ("onnx" if str(model_path).endswith(".onnx") else "pickle")
         self.model = self.__load_model()
 
     
     def __load_model(self):
+        if self.backend == "onnx":
+            return self.__load_onnx_model()
         try:
             model = load(self.model_path)
             if not hasattr(model, "predict"):
@@ -22,6 +30,31 @@ class Model:
         except Exception as e:
             raise Exception(f"{e}")
 
+    def __load_onnx_model(self):
+        if not os.path.exists(self.model_path):
+            raise Exception(f"Model file not found at {self.model_path}")
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise Exception("onnxruntime is required to load .onnx models.")
+
+        session = ort.InferenceSession(self.model_path, providers=["CPUExecutionProvider"])
+        self.input_name = session.get_inputs()[0].name
+        # skl2onnx exporta o rótulo como primeira saída e as probabilidades como segunda
+        self.output_name = session.get_outputs()[0].name
+        return session
+
+    def __build_features(self, input_data: pd.DataFrame) -> pd.DataFrame:
+        input_data = input_data.copy()
+        input_data["data_pas"] = pd.to_datetime(input_data["data_pas"])
+        input_data["month"] = input_data["data_pas"].dt.month
+        input_data["day_of_year"] = input_data["data_pas"].dt.dayofyear
+
+        input_data = input_data.drop(columns=["data_pas"])
+
+        expected_columns = ['lat', 'lon', 'numero_dias_sem_chuva', 'precipitacao', 'month', 'day_of_year']
+        return input_data[expected_columns]
+
     def predict(self, lat, lon, data_pas, numero_dias_sem_chuva, precipitacao):
         input_data = pd.DataFrame({
             'lat': [lat],
@@ -30,18 +63,71 @@ class Model:
             'numero_dias_sem_chuva': [numero_dias_sem_chuva],
             'precipitacao': [precipitacao]
         })
+        return self.predict_many(input_data)[0]
 
-        input_data["data_pas"] = pd.to_datetime(input_data["data_pas"])
-        input_data["month"] = input_data["data_pas"].dt.month
-        input_data["day_of_year"] = input_data["data_pas"].dt.dayofyear
+    def predict_many(self, input_data: pd.DataFrame) -> list:
+        """
+        Classifica todas as linhas de `input_data` (colunas lat, lon, data_pas,
+        numero_dias_sem_chuva, precipitacao) numa única chamada ao modelo.
+        """
+        if input_data.empty:
+            return []
+        return self.predict_features(self.__build_features(input_data))
 
-        input_data = input_data.drop(columns=["data_pas"])
+    def predict_features(self, features: pd.DataFrame) -> list:
+        """
+        Classifica features já no formato do treino (month e day_of_year no lugar de data_pas).
+        """
+        if self.backend == "onnx":
+            return self.predict_array(features.to_numpy(dtype=np.float32))
 
-        expected_columns = ['lat', 'lon', 'numero_dias_sem_chuva', 'precipitacao', 'month', 'day_of_year']
-        input_data = input_data[expected_columns]
+        try:
+            prediction = self.model.predict(features)
+            return [int(value) for value in prediction]
+        except Exception as e:
+            raise Exception(f"Error during prediction: {e}")
 
+    def predict_array(self, features: np.ndarray) -> list:
+        """
+        Classifica uma matriz float32 com as colunas na ordem do treino
+        (lat, lon, numero_dias_sem_chuva, precipitacao, month, day_of_year).
+        """
+        features = np.ascontiguousarray(features, dtype=np.float32)
         try:
-            prediction = self.model.predict(input_data)
-            return int(prediction[0])
+            if self.backend == "onnx":
+                prediction = self.model.run([self.output_name], {self.input_name: features})[0]
+            else:
+                prediction = self.model.predict(features)
+            return [int(value) for value in np.ravel(prediction)]
         except Exception as e:
             raise Exception(f"Error during prediction: {e}")
+
+    @staticmethod
+    def check_parity(pickle_path: str, onnx_path: str, input_data: pd.DataFrame) -> dict:
+        """
+        Classifica `input_data` com os arquivos joblib e ONNX do mesmo modelo e informa
+        quantas previsões diferem e quanto tempo cada um levou. `input_data` pode ter as
+        colunas da requisição (com data_pas) ou as features do treino.
+        """
+        pickle_model = Model(pickle_path, backend="pickle")
+        onnx_model = Model(onnx_path, backend="onnx")
+        if "data_pas" in input_data.columns:
+            input_data = pickle_model.__build_features(input_data)
+
+        started = time.perf_counter()
+        pickle_prediction = pickle_model.predict_features(input_data)
+        pickle_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        onnx_prediction = onnx_model.predict_features(input_data)
+        onnx_ms = (time.perf_counter() - started) * 1000
+
+        mismatches = sum(
+            1 for expected, value in zip(pickle_prediction, onnx_prediction) if expected != value
+        )
+        return {
+            "rows": len(pickle_prediction),
+            "mismatches": mismatches,
+            "pickle_ms": round(pickle_ms, 2),
+            "onnx_ms": round(onnx_ms, 2),
+        }
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from datetime import datetime
+from dotenv import dotenv_values, find_dotenv
+from dependencies.model import Model
+
+
+def _rss_bytes():
+    # Memória residente do processo, lida de /proc quando existe (Linux)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Mantém o Model ativo carregado uma única vez e entrega a mesma instância a todas as
+    requisições.
+
+    O modelo ativo segue MODEL_PATH. Como no load_dotenv, o valor do ambiente do processo
+    tem prioridade sobre o .env; sem ele, o .env é relido a cada `check_interval` segundos,
+    para poder ser editado com a API no ar. Quando o caminho muda, `get` carrega o novo
+    arquivo numa thread e continua entregando o modelo atual até ele ficar pronto; então
+    troca o ativo e descarta o anterior. Se o novo arquivo falhar, o anterior continua ativo.
+    """
+
+    def __init__(self, check_interval: float = 30.0):
+        self.check_interval = check_interval
+        self._models = {}
+        self._stats = {}
+        self._active = (None, None)
+        self._pending = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        # O load_dotenv copia o valor do .env para os.environ; um valor igual ao do .env na
+        # inicialização veio do arquivo, não do ambiente do processo
+        self._startup_dotenv_path = self._dotenv_path()
+
+    @staticmethod
+    def _dotenv_path():
+        env_file = find_dotenv(usecwd=True)
+        return dotenv_values(env_file).get("MODEL_PATH") if env_file else None
+
+    def _configured_path(self):
+        environment_path = os.getenv("MODEL_PATH")
+        if environment_path and environment_path != self._startup_dotenv_path:
+            return environment_path
+        return self._dotenv_path() or environment_path
+
+    def _load(self, model_path: str) -> Model:
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        model = Model(model_path)
+        load_time_ms = (time.perf_counter() - started) * 1000
+        rss_after = _rss_bytes()
+
+        self._models[model_path] = model
+        self._stats[model_path] = {
+            "model_path": model_path,
+            "load_time_ms": round(load_time_ms, 2),
+            # Aproximado: outras threads também alocam memória durante o carregamento
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "file_size_bytes": os.path.getsize(model_path),
+            "loaded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        print(
+            f"Modelo carregado: {model_path} "
+            f"({self._stats[model_path]['load_time_ms']} ms, {self._stats[model_path]['file_size_bytes']} bytes em disco)"
+        )
+        return model
+
+    def load(self, model_path: str = None) -> Model:
+        """
+        Carrega `model_path` (MODEL_PATH por padrão) uma única vez e o torna o modelo ativo.
+        """
+        model_path = model_path or self._configured_path()
+        with self._lock:
+            model = self._models.get(model_path) or self._load(model_path)
+            self._activate(model_path, model)
+            self._last_check = time.monotonic()
+        return model
+
+    def _activate(self, model_path: str, model: Model):
+        # Chamado com o lock. As requisições em andamento guardam a própria referência ao
+        # modelo anterior, que é liberado quando elas terminam
+        previous_path, _ = self._active
+        self._active = (model_path, model)
+        if previous_path is not None and previous_path != model_path:
+            self._models.pop(previous_path, None)
+            self._stats.pop(previous_path, None)
+
+    def _swap_in_background(self, model_path: str):
+        def swap():
+            try:
+                with self._lock:
+                    self._activate(model_path, self._models.get(model_path) or self._load(model_path))
+                print(f"Modelo ativo: {model_path}")
+            except Exception as e:
+                print(f"Erro ao recarregar o modelo {model_path}: {e}")
+            finally:
+                self._pending = None
+
+        self._pending = model_path
+        threading.Thread(target=swap, name="model-reload", daemon=True).start()
+
+    def get(self, model_path: str = None) -> Model:
+        if model_path is not None:
+            # Os workers do pool de processos recebem o arquivo a usar e o seguem
+            active_path, model = self._active
+            return model if model_path == active_path else self.load(model_path)
+
+        active_path, model = self._active
+        if model is None:
+            return self.load()
+
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            configured_path = self._configured_path()
+            if configured_path != active_path and configured_path != self._pending:
+                # Nunca carrega na thread de quem chamou: `get` roda no event loop
+                self._swap_in_background(configured_path)
+        return model
+
+    def stats(self):
+        active_path, _ = self._active
+        return {
+            "active": active_path,
+            "models": list(self._stats.values()),
+        }
+
+
+model_registry = ModelRegistry()
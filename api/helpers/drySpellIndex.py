@@ -0,0 +1,184 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from models import ApiForecastItem
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Dias de previsões guardados por localidade; os anteriores ficam só com a sequência já calculada.
+# Precisa cobrir o horizonte das previsões (7 dias), que uma rodada nova do modelo reescreve
+DRY_SPELL_WINDOW_DAYS = int(os.getenv("DRY_SPELL_WINDOW_DAYS", "30"))
+# Intervalo entre as leituras das linhas gravadas por outros workers
+DRY_SPELL_REFRESH_SECONDS = float(os.getenv("DRY_SPELL_REFRESH_SECONDS", "30"))
+
+
+class DrySpellIndex:
+    """
+    Índice em memória da sequência de registros sem chuva por localidade (state_id).
+
+    Para cada localidade guarda, por dia de previsão, a sequência seca acumulada
+    pelos registros dos dias anteriores, de forma que a consulta por (state, date)
+    é um acesso a dicionário. O índice é carregado uma vez a partir do banco,
+    atualizado por `ClimateApi.save_forecast_to_db` quando novas previsões chegam e,
+    a cada `DRY_SPELL_REFRESH_SECONDS`, com as linhas que outros workers gravaram.
+    Registros sem estado associado ficam todos na localidade `None`. Cada localidade
+    guarda uma linha por (modelrun, date_forecast), como a restrição única da tabela.
+
+    Só as linhas dos últimos `DRY_SPELL_WINDOW_DAYS` dias de cada localidade ficam em
+    memória. As mais antigas são resumidas na sequência do primeiro dia da janela, e
+    os seus dias mantêm a sequência calculada; uma linha que chegue depois para um
+    desses dias é ignorada.
+    """
+    _rows = {}
+    _base = {}
+    _cutoffs = {}
+    _streaks = {}
+    _days = {}
+    _tails = {}
+    _last_id = 0
+    _last_refresh = 0.0
+    _loaded = False
+    _lock = asyncio.Lock()
+
+    @classmethod
+    def _rebuild(cls, state_id):
+        """
+        Recalcula as sequências secas de uma localidade a partir do início da janela. Um
+        registro com precipitação negativa soma um à sequência, qualquer outro valor a zera
+        e um valor ausente invalida a sequência até o próximo registro com chuva.
+        """
+        rows = sorted(cls._rows[state_id].items(), key=lambda item: item[0][1])
+        cutoff = cls._cutoffs.get(state_id)
+        if not rows:
+            return
+
+        # A janela só anda para frente, acompanhando o dia mais recente
+        new_cutoff = rows[-1][0][1].date() - timedelta(days=DRY_SPELL_WINDOW_DAYS)
+        if cutoff is not None:
+            new_cutoff = max(new_cutoff, cutoff)
+
+        streaks = {
+            day: streak for day, streak in cls._streaks.get(state_id, {}).items()
+            if cutoff is not None and day < cutoff
+        }
+        streak, invalid = cls._base.get(state_id, (0, False))
+        base = None
+        for (_, date_forecast), precipitation in rows:
+            day = date_forecast.date()
+            if base is None and day >= new_cutoff:
+                base = (streak, invalid)
+            if day not in streaks:
+                streaks[day] = 0 if invalid else streak
+
+            if precipitation is None:
+                invalid = True
+            elif precipitation < 0:
+                streak += 1
+            else:
+                streak = 0
+                invalid = False
+
+        cls._rows[state_id] = {
+            key: precipitation for key, precipitation in cls._rows[state_id].items()
+            if key[1].date() >= new_cutoff
+        }
+        cls._base[state_id] = base
+        cls._cutoffs[state_id] = new_cutoff
+        cls._days[state_id] = sorted(streaks)
+        cls._streaks[state_id] = streaks
+        cls._tails[state_id] = 0 if invalid else streak
+
+    @classmethod
+    def _add(cls, rows):
+        touched = set()
+        for state_id, modelrun, date_forecast, precipitation in rows:
+            if date_forecast is None:
+                continue
+            cutoff = cls._cutoffs.get(state_id)
+            if cutoff is not None and date_forecast.date() < cutoff:
+                continue
+            cls._rows.setdefault(state_id, {})[(modelrun, date_forecast)] = precipitation
+            touched.add(state_id)
+        for state_id in touched:
+            cls._rebuild(state_id)
+
+    @classmethod
+    async def _read(cls, db_session: AsyncSession):
+        """
+        Lê as linhas gravadas depois da última leitura (todas, na primeira).
+        """
+        result = await db_session.execute(
+            select(
+                ApiForecastItem.id,
+                ApiForecastItem.state_id,
+                ApiForecastItem.modelrun,
+                ApiForecastItem.date_forecast,
+                ApiForecastItem.precipitation,
+            )
+            .filter(ApiForecastItem.id > cls._last_id)
+            .filter(ApiForecastItem.date_forecast.is_not(None))
+            .order_by(ApiForecastItem.id)
+        )
+        rows = result.all()
+        if rows:
+            cls._last_id = rows[-1][0]
+        cls._add(row[1:] for row in rows)
+        cls._last_refresh = time.monotonic()
+
+    @classmethod
+    async def load(cls, db_session: AsyncSession):
+        async with cls._lock:
+            if cls._loaded:
+                if time.monotonic() - cls._last_refresh >= DRY_SPELL_REFRESH_SECONDS:
+                    await cls._read(db_session)
+                return
+
+            await cls._read(db_session)
+            cls._loaded = True
+
+    @classmethod
+    def add(cls, rows):
+        """
+        Registra linhas (state_id, modelrun, date_forecast, precipitation) já gravadas no banco.
+        Se o índice ainda não foi carregado, a próxima consulta lê tudo do banco.
+        """
+        if not cls._loaded:
+            return
+        cls._add(rows)
+
+    @classmethod
+    async def get(cls, db_session: AsyncSession, date: str, state_id=None):
+        """
+        Retorna a sequência de registros sem chuva anteriores ao dia de `date`.
+        """
+        await cls.load(db_session)
+
+        streaks = cls._streaks.get(state_id)
+        if not streaks:
+            return 0
+
+        target_day = datetime.strptime(date, "%Y-%m-%d %H:%M").date()
+        if target_day in streaks:
+            return streaks[target_day]
+
+        days = cls._days[state_id]
+        position = bisect_left(days, target_day)
+        if position == 0:
+            return 0
+        if position == len(days):
+            return cls._tails[state_id]
+        return streaks[days[position]]
+
+    @classmethod
+    def reset(cls):
+        cls._rows = {}
+        cls._base = {}
+        cls._cutoffs = {}
+        cls._streaks = {}
+        cls._days = {}
+        cls._tails = {}
+        cls._last_id = 0
+        cls._last_refresh = 0.0
+        cls._loaded = False
@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class ForecastCache:
+    """
+    Cache LRU das respostas da meteoblue por coordenada arredondada.
+
+    Cada entrada guarda a resposta junto com o seu modelrun e vale até
+    `refresh_after` segundos depois de `modelrun_updatetime_utc`, que é quando uma
+    nova rodada do modelo deve estar disponível (com um mínimo de `min_ttl`).
+    Ao passar de `max_entries`, a entrada usada há mais tempo é descartada.
+    """
+
+    def __init__(self, max_entries: int = 256, precision: int = 2, refresh_after: float = 3600, min_ttl: float = 300):
+        self.max_entries = max_entries
+        self.precision = precision
+        self.refresh_after = refresh_after
+        self.min_ttl = min_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def key(self, lat: float, lon: float):
+        return (round(float(lat), self.precision), round(float(lon), self.precision))
+
+    def _expires_at(self, data: dict) -> float:
+        now = time.time()
+        try:
+            modelrun = datetime.strptime(
+                data["metadata"]["modelrun_updatetime_utc"], "%Y-%m-%d %H:%M"
+            ).replace(tzinfo=timezone.utc)
+            return max(modelrun.timestamp() + self.refresh_after, now + self.min_ttl)
+        except (KeyError, TypeError, ValueError):
+            return now + self.min_ttl
+
+    def get(self, lat: float, lon: float):
+        key = self.key(lat, lon)
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, lat: float, lon: float, data: dict):
+        key = self.key(lat, lon)
+        self._entries[key] = (data, self._expires_at(data))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+        }
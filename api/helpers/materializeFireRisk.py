@@ -0,0 +1,140 @@
+import time
+from datetime import datetime
+from sqlalchemy import and_, false, func, or_
+from sqlalchemy.future import select
+from db import SessionLocal, upsert
+from models import ApiForecastItem, FireRisk
+from helpers.processManyStates import ProcessManyStates
+from metrics import ROWS_SCANNED
+
+
+class MaterializeFireRisk:
+    """
+    Calcula o risco de incêndio de cada (estado, horário) previsto e grava na tabela FireRisk,
+    para que o /fireRisk/ seja apenas uma leitura indexada.
+
+    Quando o mesmo horário aparece em mais de uma rodada do modelo, vale a gravada por último.
+    """
+    last_run = None
+
+    @staticmethod
+    async def run(state_ids=None, since=None):
+        """
+        Recalcula os estados em `state_ids` (todos por padrão) a partir de `since`, um
+        horário ou um dicionário {state_id: horário} com o início de cada estado. Novas
+        previsões só alteram os dias sem chuva dos dias seguintes, então os anteriores a
+        `since` não precisam ser recalculados.
+        """
+        started = time.perf_counter()
+        async with SessionLocal() as session:
+            query = (
+                select(ApiForecastItem)
+                .filter(ApiForecastItem.state_id.is_not(None))
+                .filter(ApiForecastItem.date_forecast.is_not(None))
+                .order_by(ApiForecastItem.id)
+            )
+            if state_ids is not None:
+                query = query.filter(ApiForecastItem.state_id.in_(state_ids))
+            if isinstance(since, dict):
+                query = query.filter(or_(false(), *(
+                    and_(ApiForecastItem.state_id == state_id, ApiForecastItem.date_forecast >= start)
+                    for state_id, start in since.items()
+                )))
+            elif since is not None:
+                query = query.filter(ApiForecastItem.date_forecast >= since)
+            result = await session.execute(query)
+
+            scanned = result.scalars().all()
+            ROWS_SCANNED.observe(len(scanned), source="forecasts")
+            latest = {}
+            for item in scanned:
+                latest[(item.state_id, item.date_forecast)] = item
+            items = list(latest.values())
+
+            if items:
+                input_data = await ProcessManyStates.build_features(session, items)
+                results = await ProcessManyStates.predict(input_data)
+
+                computed_at = datetime.now()
+                rows = [
+                    {
+                        "state_id": item.state_id,
+                        "date_forecast": item.date_forecast,
+                        "modelrun": item.modelrun,
+                        "result": risk,
+                        "numero_dias_sem_chuva": int(dias_sem_chuva),
+                        "precipitation": item.precipitation,
+                        "computed_at": computed_at,
+                    }
+                    for item, risk, dias_sem_chuva in zip(items, results, input_data["numero_dias_sem_chuva"])
+                ]
+                statement = upsert(FireRisk.__table__)
+                await session.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=["state_id", "date_forecast"],
+                        set_={
+                            column: statement.excluded[column]
+                            for column in ["modelrun", "result", "numero_dias_sem_chuva", "precipitation", "computed_at"]
+                        },
+                    ),
+                    rows,
+                )
+                await session.commit()
+
+        MaterializeFireRisk.last_run = {
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "rows": len(items),
+            "seconds": round(time.perf_counter() - started, 4),
+        }
+        print(f"Risco de incêndio materializado: {len(items)} linhas em {MaterializeFireRisk.last_run['seconds']}s")
+        return MaterializeFireRisk.last_run
+
+    @staticmethod
+    async def pending_since(session) -> dict:
+        """
+        Retorna {state_id: horário} com a previsão mais antiga de cada estado que ainda não
+        está no FireRisk como a última gravada: sem linha no FireRisk ou com outra rodada
+        ou precipitação. Cobre estados novos e materializações interrompidas, mesmo quando
+        as previsões são anteriores às linhas mais novas do FireRisk.
+        """
+        latest = (
+            select(
+                ApiForecastItem.state_id,
+                ApiForecastItem.date_forecast,
+                func.max(ApiForecastItem.id).label("id"),
+            )
+            .filter(ApiForecastItem.state_id.is_not(None))
+            .filter(ApiForecastItem.date_forecast.is_not(None))
+            .group_by(ApiForecastItem.state_id, ApiForecastItem.date_forecast)
+            .subquery()
+        )
+        query = (
+            select(latest.c.state_id, func.min(latest.c.date_forecast))
+            .select_from(latest)
+            .join(ApiForecastItem, ApiForecastItem.id == latest.c.id)
+            .outerjoin(
+                FireRisk,
+                and_(
+                    FireRisk.state_id == latest.c.state_id,
+                    FireRisk.date_forecast == latest.c.date_forecast,
+                ),
+            )
+            .filter(or_(
+                FireRisk.id.is_(None),
+                FireRisk.modelrun != ApiForecastItem.modelrun,
+                FireRisk.precipitation.is_distinct_from(ApiForecastItem.precipitation),
+            ))
+            .group_by(latest.c.state_id)
+        )
+        result = await session.execute(query)
+        return {state_id: since for state_id, since in result.all()}
+
+    @staticmethod
+    async def catch_up():
+        """
+        Materializa só as previsões de cada estado a partir da mais antiga ainda pendente
+        (veja `pending_since`), para a subida da API não recalcular o histórico.
+        """
+        async with SessionLocal() as session:
+            since = await MaterializeFireRisk.pending_since(session)
+        return await MaterializeFireRisk.run(state_ids=list(since), since=since)
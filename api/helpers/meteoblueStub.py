@@ -0,0 +1,61 @@
+"""
+Servidor local que imita o pacote basic-1h da meteoblue, para testar a ingestão sem
+gastar chamadas da API real:
+
+    uvicorn helpers.meteoblueStub:app --port 8001
+
+e defina API_URL=http://127.0.0.1:8001 no .env.
+"""
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+
+
+app = FastAPI()
+
+
+@app.get("/packages/basic-1h")
+def basic_1h(lat: float, lon: float, hours: int = 168):
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    start = now.replace(hour=0)
+    times = [(start + timedelta(hours=i)).strftime("%Y-%m-%d %H:%M") for i in range(hours)]
+
+    return {
+        "metadata": {
+            "modelrun_updatetime_utc": now.strftime("%Y-%m-%d %H:%M"),
+            "name": "",
+            "height": 40,
+            "timezone_abbrevation": "GMT-04",
+            "latitude": lat,
+            "modelrun_utc": start.strftime("%Y-%m-%d %H:%M"),
+            "longitude": lon,
+            "utc_timeoffset": -4.0,
+            "generation_time_ms": 1.5,
+        },
+        "units": {
+            "precipitation": "mm",
+            "windspeed": "ms-1",
+            "precipitation_probability": "percent",
+            "relativehumidity": "percent",
+            "temperature": "C",
+            "time": "YYYY-MM-DD hh:mm",
+            "pressure": "hPa",
+            "winddirection": "degree",
+        },
+        "data_1h": {
+            "time": times,
+            "precipitation": [0.0 if i % 24 < 18 else 1.2 for i in range(hours)],
+            "snowfraction": [0] * hours,
+            "rainspot": ["0" * 49] * hours,
+            "temperature": [24.0 + (i % 24) / 3 for i in range(hours)],
+            "felttemperature": [26.0 + (i % 24) / 3 for i in range(hours)],
+            "pictocode": [1] * hours,
+            "windspeed": [1.5] * hours,
+            "winddirection": [90] * hours,
+            "relativehumidity": [80] * hours,
+            "sealevelpressure": [1010.0] * hours,
+            "precipitation_probability": [10] * hours,
+            "convective_precipitation": [0.0] * hours,
+            "isdaylight": [1 if 6 <= i % 24 < 18 else 0 for i in range(hours)],
+            "uvindex": [5 if 6 <= i % 24 < 18 else 0 for i in range(hours)],
+        },
+    }
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from collections import Counter
+from helpers.processManyStates import ProcessManyStates
+from metrics import timed
+
+
+class PredictionBatcher:
+    """
+    Agrupa previsões de um ponto feitas ao mesmo tempo em uma única chamada ao modelo.
+
+    Cada requisição entra em uma fila e espera o seu resultado. O worker junta
+    os pedidos por até `max_wait_ms` milissegundos ou `max_batch_size` itens,
+    chama `ProcessManyStates.score_points` uma vez, fora do event loop, e
+    devolve a cada requisição o seu resultado.
+    """
+
+    def __init__(self, max_wait_ms: float = 5, max_batch_size: int = 64):
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.items = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = Counter()
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+        self._worker = None
+
+    async def submit(self, point):
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        # O modelo roda na task do worker, então a requisição só enxerga o tempo de espera
+        with timed("batcher"):
+            await self._queue.put((point, future))
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+            return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Requisições canceladas enquanto esperavam não entram no lote
+            batch = [(point, future) for point, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            try:
+                results = await ProcessManyStates.score_points([point for point, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
@@ -1,77 +1,184 @@
-from models import ApiForecastItem
+from models import FireRisk, State
+from db import SessionLocal
+from sqlalchemy import tuple_
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
-from dependencies.model import Model
+from datetime import datetime, timedelta
+from dependencies.feature_scaling import feature_scaling
+from dependencies.inference_executor import inference_executor
+from helpers.drySpellIndex import DrySpellIndex
+from metrics import ROWS_SCANNED, timed
+import pandas as pd
 
 
 class ProcessManyStates:
     @staticmethod
-    async def get_days_without_rain(db_session: AsyncSession, date: str):
+    async def get_days_without_rain(db_session: AsyncSession, date: str, state_id=None):
         try:
-            target_date = datetime.strptime(date, "%Y-%m-%d %H:%M").date()
+            return await DrySpellIndex.get(db_session=db_session, date=date, state_id=state_id)
+        except Exception as e:
+            print(f"Erro ao calcular dias sem chuva: {e}")
+            return 0
 
+    @staticmethod
+    async def build_features(db_session: AsyncSession, items) -> pd.DataFrame:
+        """
+        Monta a matriz de entrada do modelo para uma lista de ApiForecastItem, com a
+        latitude e a longitude do estado de cada previsão.
+        """
+        with timed("features"):
             result = await db_session.execute(
-                select(ApiForecastItem)
-                .filter(ApiForecastItem.date_forecast <= target_date)
-                .order_by(ApiForecastItem.date_forecast.desc())
+                select(State.id, State.lat, State.lon)
+                .filter(State.id.in_({item.state_id for item in items}))
             )
-            items = result.scalars().all()
-
-            days_without_rain = 0
+            coordenadas = {state_id: (lat, lon) for state_id, lat, lon in result.all()}
 
+            # O número de dias sem chuva depende apenas da localidade e do dia
+            dias_sem_chuva = {}
             for item in items:
-                item_date = datetime.strptime(
-                    item.date_forecast, "%Y-%m-%d %H:%M"
-                ).date()
+                key = (item.state_id, item.date_forecast.date())
+                if key not in dias_sem_chuva:
+                    dias_sem_chuva[key] = await ProcessManyStates.get_days_without_rain(
+                        db_session=db_session,
+                        date=item.date_forecast.strftime("%Y-%m-%d %H:%M"),
+                        state_id=item.state_id,
+                    )
+
+            return pd.DataFrame({
+                "lat": [coordenadas[item.state_id][0] for item in items],
+                "lon": [coordenadas[item.state_id][1] for item in items],
+                "data_pas": [item.date_forecast for item in items],
+                "numero_dias_sem_chuva": [
+                    dias_sem_chuva[(item.state_id, item.date_forecast.date())] for item in items
+                ],
+                "precipitacao": [item.precipitation for item in items],
+            })
 
-                if item.precipitation < 0:
-                    days_without_rain += 1
-                else:
-                    break
+    @staticmethod
+    async def predict(input_data: pd.DataFrame) -> list:
+        """
+        Normaliza os valores brutos com os parâmetros do pré-processamento do treino e
+        calcula o risco. É o caminho único até o modelo, para o /fireRisk/ materializado e o
+        /fireRisk/detail darem o mesmo resultado para a mesma entrada.
+        """
+        with timed("features"):
+            input_data = feature_scaling.transform(input_data)
+        return await inference_executor.predict_many(input_data)
 
-            return days_without_rain if days_without_rain > 0 else 0
+    @staticmethod
+    async def score_points(points):
+        """
+        Calcula o risco de uma lista de PayloadBody com uma única chamada ao modelo.
+        """
+        now = datetime.now()
+        dates = [point.date or now for point in points]
+        with timed("features"):
+            input_data = pd.DataFrame({
+                "lat": [point.lat for point in points],
+                "lon": [point.lon for point in points],
+                "data_pas": dates,
+                "numero_dias_sem_chuva": [point.numero_dias_sem_chuva for point in points],
+                "precipitacao": [point.precipitacao for point in points],
+            })
+        results = await ProcessManyStates.predict(input_data)
+        return [
+            {
+                "result": str(result),
+                "lat": point.lat,
+                "lon": point.lon,
+                "date": point_date.strftime("%Y-%m-%d %H:%M")
+            }
+            for point, point_date, result in zip(points, dates, results)
+        ]
 
-        except Exception as e:
-            print(f"Erro ao calcular dias sem chuva: {e}")
-            return 0
+    @staticmethod
+    def _materialized_query(date: str, cursor: str = None):
+        day_start = datetime.combine(
+            datetime.strptime(date, "%Y-%m-%d").date(), datetime.min.time()
+        )
+        query = (
+            select(FireRisk.result, FireRisk.date_forecast, State.name, FireRisk.state_id)
+            .join(State, FireRisk.state_id == State.id)
+            .filter(FireRisk.date_forecast >= day_start)
+            .filter(FireRisk.date_forecast < day_start + timedelta(days=1))
+            .order_by(FireRisk.state_id, FireRisk.date_forecast)
+        )
+        if cursor is not None:
+            state_id, date_forecast = ProcessManyStates.decode_cursor(cursor)
+            query = query.filter(
+                tuple_(FireRisk.state_id, FireRisk.date_forecast) > tuple_(state_id, date_forecast)
+            )
+        return query
+
+    @staticmethod
+    def _serialize_risk(risk, date_forecast, local):
+        return {
+            "result": str(risk),
+            "local": local,
+            "date": date_forecast.strftime("%Y-%m-%d %H:%M")
+        }
+
+    @staticmethod
+    def encode_cursor(state_id: int, date_forecast: datetime) -> str:
+        return f"{state_id}_{date_forecast.strftime('%Y%m%d%H%M')}"
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        try:
+            state_id, date_forecast = cursor.split("_")
+            return int(state_id), datetime.strptime(date_forecast, "%Y%m%d%H%M")
+        except ValueError:
+            raise ValueError(f"Cursor inválido: {cursor}")
+
+    @staticmethod
+    async def get_materialized(db_session: AsyncSession, date: str):
+        """
+        Lê do FireRisk os riscos já calculados para o dia.
+        """
+        result = await db_session.execute(ProcessManyStates._materialized_query(date))
+        rows = result.all()
+        ROWS_SCANNED.observe(len(rows), source="fire_risk")
+        return [
+            ProcessManyStates._serialize_risk(risk, date_forecast, local)
+            for risk, date_forecast, local, _ in rows
+        ]
 
     @staticmethod
-    async def get(db_session: AsyncSession, date: str):
-        model = Model()
-        result = await db_session.execute(select(ApiForecastItem))
-        items = result.scalars().all()
-        items_list = []
-        for item in items:
-            item_date = datetime.strptime(
-                item.date_forecast, "%Y-%m-%d %H:%M"
-            ).date()
-            input_date = datetime.strptime(date, "%Y-%m-%d %H:%M").date()
-            if item_date == input_date:
-                numero_dias_sem_chuva = await ProcessManyStates.get_days_without_rain(
-                    db_session=db_session, date=date
-                )
+    async def get_materialized_page(db_session: AsyncSession, date: str, limit: int, cursor: str = None):
+        """
+        Página de até `limit` riscos do dia a partir de `cursor`. Retorna também o cursor
+        da próxima página, ou None quando não há mais registros.
+        """
+        result = await db_session.execute(
+            ProcessManyStates._materialized_query(date, cursor).limit(limit + 1)
+        )
+        rows = result.all()
+        ROWS_SCANNED.observe(len(rows), source="fire_risk")
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            _, date_forecast, _, state_id = rows[-1]
+            next_cursor = ProcessManyStates.encode_cursor(state_id, date_forecast)
 
-                result = model.predict(  
-                    lat="0.5159170029240021",
-                    lon="0.7610174486938237",
-                    data_pas=item.date_forecast,
-                    numero_dias_sem_chuva=numero_dias_sem_chuva,
-                    precipitacao=item.precipitation,
-                )
-                print(f"\n\n\n result: {result} \n\n\n")
-                # Garantir que o resultado seja serializável
-                if isinstance(result, dict):
-                    serialized_result = result
-                else:
-                    serialized_result = {
-                        key: value for key, value in vars(result).items()
-                    } if hasattr(result, "__dict__") else str(result)
+        items = [
+            ProcessManyStates._serialize_risk(risk, date_forecast, local)
+            for risk, date_forecast, local, _ in rows
+        ]
+        return items, next_cursor
 
-                object_item = {
-                    "result": serialized_result,
-                    "local": "Manaus",
-                    "date": item.date_forecast
-                }
-                items_list.append(object_item)
-        return items_list
+    @staticmethod
+    async def stream_materialized(date: str, chunk_size: int = 500):
+        """
+        Gera os riscos do dia lendo o banco em blocos de `chunk_size` com um cursor assíncrono,
+        sem montar a lista completa em memória.
+        """
+        async with SessionLocal() as session:
+            result = await session.stream(
+                ProcessManyStates._materialized_query(date).execution_options(yield_per=chunk_size)
+            )
+            rows = 0
+            async for partition in result.partitions(chunk_size):
+                rows += len(partition)
+                for risk, date_forecast, local, _ in partition:
+                    yield ProcessManyStates._serialize_risk(risk, date_forecast, local)
+            ROWS_SCANNED.observe(rows, source="fire_risk")
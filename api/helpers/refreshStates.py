@@ -0,0 +1,103 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from sqlalchemy.future import select
+from db import SessionLocal
+from models import State
+from helpers.materializeFireRisk import MaterializeFireRisk
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "helpers")))
+from amazonia_legal import AmazoniaLegal
+
+
+class RefreshStates:
+    """
+    Atualiza as previsões de todos os estados da tabela State.
+
+    As buscas na meteoblue rodam em paralelo, limitadas por `parallelism`, e cada
+    resultado é gravado em lote assim que chega. As gravações são serializadas para
+    não disputar o lock de escrita do SQLite.
+    """
+    last_run = None
+
+    @staticmethod
+    async def seed_states():
+        """
+        Cria uma linha em State para cada estado de AmazoniaLegal que ainda não existe,
+        seja pelo nome ou pelas coordenadas da capital.
+        """
+        async with SessionLocal() as session:
+            async with session.begin():
+                result = await session.execute(select(State.name, State.lat, State.lon))
+                rows = result.all()
+                existing_names = {name for name, _, _ in rows}
+                existing_points = {(lat, lon) for _, lat, lon in rows}
+                for name, sigla in AmazoniaLegal.estados.items():
+                    lat, lon = AmazoniaLegal.capitais[sigla]
+                    if name in existing_names or (lat, lon) in existing_points:
+                        continue
+                    session.add(State(name=name, lat=lat, lon=lon))
+
+    @staticmethod
+    async def run(climate_api, parallelism: int = 4):
+        started = time.perf_counter()
+        await RefreshStates.seed_states()
+
+        async with SessionLocal() as session:
+            result = await session.execute(select(State).order_by(State.id))
+            states = [(state.id, state.name, state.lat, state.lon) for state in result.scalars().all()]
+
+        semaphore = asyncio.Semaphore(parallelism)
+        write_lock = asyncio.Lock()
+
+        async def refresh(state_id, name, lat, lon):
+            timing = {"state": name, "state_id": state_id, "fetch_seconds": None, "save_seconds": None, "rows": 0, "error": None}
+            try:
+                async with semaphore:
+                    fetch_started = time.perf_counter()
+                    data = await climate_api.fetch_forecast_async(lat, lon)
+                    timing["fetch_seconds"] = round(time.perf_counter() - fetch_started, 4)
+
+                async with write_lock:
+                    save_started = time.perf_counter()
+                    stats = await climate_api.save_forecast_to_db(data, lat, lon, state_id=state_id)
+                    timing["save_seconds"] = round(time.perf_counter() - save_started, 4)
+                    timing["rows"] = stats["rows"]
+                    timing["first_forecast"] = stats.get("first_forecast")
+            except Exception as e:
+                timing["error"] = str(e)
+                print(f"Erro ao atualizar previsões de {name}: {e}")
+            return timing
+
+        timings = await asyncio.gather(*(refresh(*state) for state in states))
+
+        # Só os estados que receberam linhas novas precisam ter o risco recalculado
+        updated = [timing for timing in timings if timing["rows"]]
+        if updated:
+            await MaterializeFireRisk.run(
+                state_ids=[timing["state_id"] for timing in updated],
+                since=min(timing["first_forecast"] for timing in updated),
+            )
+
+        RefreshStates.last_run = {
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - started, 4),
+            "parallelism": parallelism,
+            "states": list(timings),
+        }
+        print(f"Previsões de {len(states)} estados atualizadas em {RefreshStates.last_run['total_seconds']}s")
+        return RefreshStates.last_run
+
+    @staticmethod
+    async def schedule(climate_api, interval_minutes: float, parallelism: int = 4):
+        """
+        Executa `run` a cada `interval_minutes` até a task ser cancelada.
+        """
+        while True:
+            try:
+                await RefreshStates.run(climate_api, parallelism=parallelism)
+            except Exception as e:
+                print(f"Erro na atualização agendada das previsões: {e}")
+            await asyncio.sleep(interval_minutes * 60)
@@ -1,9 +1,15 @@
-import asyncio
-from db import engine
-from models import Base
+import os
+from alembic import command
+from alembic.config import Config
+
+API_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def init_db():
+    # O banco é montado pelas migrações, para já sair marcado com a revisão atual
+    config = Config(os.path.join(API_PATH, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(API_PATH, "alembic"))
+    command.upgrade(config, "head")
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
 if __name__ == "__main__":
-    asyncio.run(init_db())
+    init_db()
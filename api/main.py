@@ -1,17 +1,83 @@
 from serializer import Serializer
-from fastapi import FastAPI
-from models import PayloadBody
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from models import PayloadBody, PayloadBatch
 from dependencies.climate_api import ClimateApi
-from dependencies.model import Model 
+from dependencies.model_registry import model_registry
+from dependencies.inference_executor import inference_executor, InferenceBusyError
+from dependencies.feature_scaling import FeatureScalingError
 from db import SessionLocal
 from fastapi import Request
 from helpers.processManyStates import ProcessManyStates
-from fastapi import Depends
+from fastapi import Depends, BackgroundTasks, Query
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
-app = FastAPI()
-model_ai = Model()
-climate_api = ClimateApi()
+from helpers.refreshStates import RefreshStates
+from helpers.materializeFireRisk import MaterializeFireRisk
+from helpers.predictionBatcher import PredictionBatcher
+from metrics import metrics, REQUEST_LATENCY, start_request, end_request, server_timing
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
+from datetime import date
+from typing import Optional
+
+REFRESH_INTERVAL_MINUTES = float(os.getenv("REFRESH_INTERVAL_MINUTES", "0"))
+REFRESH_PARALLELISM = int(os.getenv("REFRESH_PARALLELISM", "4"))
+FIRE_RISK_MAX_PAGE_SIZE = int(os.getenv("FIRE_RISK_MAX_PAGE_SIZE", "1000"))
+PREDICTION_BATCH_WAIT_MS = float(os.getenv("PREDICTION_BATCH_WAIT_MS", "5"))
+PREDICTION_BATCH_SIZE = int(os.getenv("PREDICTION_BATCH_SIZE", "64"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    model_registry.load()
+    prediction_batcher.start()
+    # Garante que previsões gravadas antes da subida da API tenham o risco calculado
+    materialize_task = asyncio.create_task(MaterializeFireRisk.catch_up())
+    refresh_task = None
+    if REFRESH_INTERVAL_MINUTES > 0:
+        refresh_task = asyncio.create_task(
+            RefreshStates.schedule(climate_api, REFRESH_INTERVAL_MINUTES, parallelism=REFRESH_PARALLELISM)
+        )
+    yield
+    materialize_task.cancel()
+    if refresh_task is not None:
+        refresh_task.cancel()
+    await prediction_batcher.stop()
+    inference_executor.shutdown()
+    await climate_api.aclose()
+
+app = FastAPI(lifespan=lifespan)
+climate_api = ClimateApi(max_concurrency=REFRESH_PARALLELISM)
+prediction_batcher = PredictionBatcher(max_wait_ms=PREDICTION_BATCH_WAIT_MS, max_batch_size=PREDICTION_BATCH_SIZE)
+
+metrics.gauge("forecast_cache_hit_ratio", "Hit ratio of the forecast cache.", lambda: climate_api.cache.stats()["hit_ratio"])
+metrics.gauge("forecast_cache_entries", "Entries in the forecast cache.", lambda: climate_api.cache.stats()["entries"])
+metrics.gauge("prediction_batcher_queue_depth", "Requests waiting in the prediction batcher.", lambda: prediction_batcher.stats()["queue_depth"])
+metrics.gauge("inference_pending", "Inference calls running or waiting for the executor.", lambda: inference_executor.pending)
+metrics.gauge("fire_risk_materialized_rows", "Rows written by the last FireRisk materialization.", lambda: (MaterializeFireRisk.last_run or {}).get("rows"))
+metrics.gauge("fire_risk_materialize_seconds", "Duration of the last FireRisk materialization.", lambda: (MaterializeFireRisk.last_run or {}).get("seconds"))
+
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    started = time.perf_counter()
+    token = start_request()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        stages = end_request(token)
+        total = time.perf_counter() - started
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            total, method=request.method, route=route.path if route else "unmatched", status=status
+        )
+    response.headers["Server-Timing"] = server_timing(stages, total)
+    return response
 
 async def get_db():
     async with SessionLocal() as session:
@@ -23,24 +89,103 @@ def read_root():
 
 
 @app.get("/fireRisk/")
-async def inferir_todos(db: AsyncSession = Depends(get_db)):
-    data = await ProcessManyStates.get(date="2024-12-08 00:00", db_session=db)
+async def inferir_todos(
+    target_date: Optional[date] = Query(None, alias="date"),
+    stream: bool = False,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    target_date = (target_date or date.today()).isoformat()
+
+    if stream:
+        if limit is not None or cursor is not None:
+            raise HTTPException(status_code=400, detail="stream=true não aceita limit nem cursor")
+        # A sessão do Depends é fechada antes do envio da resposta; o stream abre a sua
+        return StreamingResponse(
+            Serializer.serialize_ndjson(ProcessManyStates.stream_materialized(date=target_date)),
+            media_type="application/x-ndjson"
+        )
+
+    if limit is not None or cursor is not None:
+        # Limites acima de FIRE_RISK_MAX_PAGE_SIZE são reduzidos a ele
+        limit = min(limit or FIRE_RISK_MAX_PAGE_SIZE, FIRE_RISK_MAX_PAGE_SIZE)
+        try:
+            data, next_cursor = await ProcessManyStates.get_materialized_page(
+                date=target_date, limit=limit, cursor=cursor, db_session=db
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return Serializer.serialize_page(data, next_cursor)
+
+    data = await ProcessManyStates.get_materialized(date=target_date, db_session=db)
     return Serializer.serialize_many(data)
 
 @app.get("/fireRisk/detail")
-def inferir(input_data: PayloadBody):
-    data = model_ai.predict(input_data)
+async def inferir(input_data: PayloadBody):
+    try:
+        data = await prediction_batcher.submit(input_data)
+    except (InferenceBusyError, FeatureScalingError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return Serializer.serialize_data(data)  
 
 
+@app.post("/fireRisk/detail/batch")
+async def inferir_lote(input_data: PayloadBatch):
+    try:
+        data = await ProcessManyStates.score_points(input_data.points)
+    except (InferenceBusyError, FeatureScalingError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return Serializer.serialize_many(data)
+
+
+@app.get("/fireRisk/detail/batcher")
+def get_prediction_batcher():
+    return prediction_batcher.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/models/")
+def get_models():
+    return model_registry.stats()
+
+
+@app.get("/models/executor")
+def get_inference_executor():
+    return inference_executor.stats()
+
+
 @app.get("/api_climate/data")
-async def get_climate_data(request: Request):
+async def get_climate_data(request: Request, background_tasks: BackgroundTasks):
     input_data = await request.json()
     try:
         lat = input_data["lat"]
         lon = input_data["lon"]
-        data = climate_api.fetch_forecast(lat, lon)
-        await climate_api.save_forecast_to_db(data, lat, lon)
+        data = await climate_api.fetch_forecast_async(lat, lon)
+        stats = await climate_api.save_forecast_to_db(data, lat, lon)
+        if not stats["skipped"] and stats["rows"]:
+            background_tasks.add_task(
+                MaterializeFireRisk.run, state_ids=[stats["state_id"]], since=stats["first_forecast"]
+            )
     except Exception as e:
         data = {"erro": f"Error during fetch data: {e}"}
-    return data
\ No newline at end of file
+    return data
+
+
+@app.get("/api_climate/cache")
+def get_forecast_cache():
+    return climate_api.cache.stats()
+
+
+@app.post("/api_climate/refresh")
+async def refresh_states():
+    return await RefreshStates.run(climate_api, parallelism=REFRESH_PARALLELISM)
+
+
+@app.get("/api_climate/refresh")
+def get_last_refresh():
+    return RefreshStates.last_run or {}
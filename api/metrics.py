@@ -0,0 +1,186 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Tempo acumulado por etapa da requisição atual, usado no cabeçalho Server-Timing
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total) in sorted(self._values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class Gauge:
+    """
+    Valor lido no momento da coleta, a partir de `callback`.
+    """
+
+    def __init__(self, name: str, help: str, callback):
+        self.name = name
+        self.help = help
+        self.callback = callback
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Erro ao ler a métrica {self.name}: {e}")
+            return
+        if value is not None:
+            yield f"{self.name} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """
+    Registro das métricas da API, exportadas no formato texto do Prometheus.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, buckets=LATENCY_BUCKETS, labelnames=()) -> Histogram:
+        return self._register(Histogram(name, help, buckets, labelnames))
+
+    def gauge(self, name: str, help: str, callback) -> Gauge:
+        return self._register(Gauge(name, help, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests by route.", labelnames=("method", "route", "status")
+)
+STAGE_LATENCY = metrics.histogram(
+    "stage_duration_seconds", "Time spent in each stage of request handling.", labelnames=("stage",)
+)
+DB_QUERY_LATENCY = metrics.histogram(
+    "db_query_duration_seconds", "Latency of each database statement.", labelnames=("operation",)
+)
+ROWS_SCANNED = metrics.histogram(
+    "rows_scanned", "Rows read from the database per operation.", buckets=SIZE_BUCKETS, labelnames=("source",)
+)
+MODEL_BATCH_SIZE = metrics.histogram(
+    "model_batch_size", "Rows sent to the model in each predict call.", buckets=SIZE_BUCKETS
+)
+UPSTREAM_LATENCY = metrics.histogram(
+    "upstream_request_duration_seconds", "Latency of requests to the forecast API.", labelnames=("status",)
+)
+
+
+def start_request():
+    """
+    Começa a acumular os tempos por etapa da requisição atual. Retorna o token para `end_request`.
+    """
+    return _request_stages.set({})
+
+
+def end_request(token) -> dict:
+    stages = _request_stages.get() or {}
+    _request_stages.reset(token)
+    return stages
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_LATENCY.observe(seconds, stage=stage)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def server_timing(stages: dict, total: float) -> str:
+    parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def instrument_engine(engine):
+    """
+    Mede cada comando executado pelo `engine` (assíncrono) e soma na etapa "db" da requisição.
+
+    O início fica no contexto de execução do próprio comando: um comando que falha não chega
+    ao after_cursor_execute e o seu início some junto com o contexto, sem afetar os próximos.
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_LATENCY.observe(seconds, operation=operation)
+        record_stage("db", seconds)
@@ -1,27 +1,41 @@
+import os
+from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Any
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from typing import Any, List, Optional
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint
 from db import Base
 from sqlalchemy.orm import relationship
 class PayloadBody(BaseModel):
     lat: float = Field(..., ge=-90, le=90, description="Latitude between -90 and 90")
     lon: float = Field(..., ge=-180, le=180, description="Longitude between -180 and 180")
+    date: Optional[datetime] = Field(None, description="Date and time to score, defaults to now")
+    numero_dias_sem_chuva: int = Field(0, ge=0, description="Consecutive days without rain")
+    precipitacao: float = Field(0, ge=0, description="Precipitation in mm")
+
+FIRE_RISK_MAX_BATCH_SIZE = int(os.getenv("FIRE_RISK_MAX_BATCH_SIZE", "500"))
+
+class PayloadBatch(BaseModel):
+    points: List[PayloadBody] = Field(..., min_length=1, max_length=FIRE_RISK_MAX_BATCH_SIZE)
 
 class ApiForecastHeader(Base):
     __tablename__ = "ForecastsHeader"
+    __table_args__ = (
+        UniqueConstraint("modelrun", "latitude", "longitude", name="uq_ForecastsHeader_modelrun_location"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     modelrun = Column(String, nullable=False)
     name = Column(String, nullable=True)
     height = Column(Integer, nullable=True)
     timezone_abbrevation = Column(String, nullable=True)
-    latitude = Column(Integer, nullable=True)
+    latitude = Column(Float, nullable=True)
     modelrun_utc = Column(String, nullable=True)
-    longitude = Column(Integer, nullable=True)
+    longitude = Column(Float, nullable=True)
     utc_timeoffset = Column(Integer, nullable=True)
     generation_time_ms = Column(Float, nullable=True)
 
 class Units(Base):
     __tablename__ = "Units"
+    __table_args__ = (UniqueConstraint("modelrun", name="uq_Units_modelrun"),)
 
     id = Column(Integer, primary_key=True, index=True)
     modelrun = Column(String, nullable=False)
@@ -44,9 +58,12 @@ class State(Base):
 
 class ApiForecastItem(Base):
     __tablename__ = "Forecasts"
+    __table_args__ = (
+        UniqueConstraint("state_id", "modelrun", "date_forecast", name="uq_Forecasts_state_modelrun_date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     modelrun = Column(String, nullable=False)
-    date_forecast = Column(String, nullable=True)
+    date_forecast = Column(DateTime, nullable=True, index=True)
     windspeed = Column(Float, nullable=True)
     temperature = Column(Float, nullable=True)
     precipitation_probability = Column(Float, nullable=True)
@@ -63,3 +80,16 @@ class ApiForecastItem(Base):
     state_id = Column(Integer, ForeignKey("State.id"), nullable=True)
     state = relationship("State", back_populates="forecast_items")
 
+class FireRisk(Base):
+    __tablename__ = "FireRisk"
+    __table_args__ = (
+        UniqueConstraint("state_id", "date_forecast", name="uq_FireRisk_state_date"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    state_id = Column(Integer, ForeignKey("State.id"), nullable=False)
+    date_forecast = Column(DateTime, nullable=False, index=True)
+    modelrun = Column(String, nullable=False)
+    result = Column(Integer, nullable=False)
+    numero_dias_sem_chuva = Column(Integer, nullable=True)
+    precipitation = Column(Float, nullable=True)
+    computed_at = Column(DateTime, nullable=False)
@@ -1,3 +1,5 @@
+import json
+
 class Serializer: 
     
     @staticmethod
@@ -9,4 +11,17 @@ class Serializer:
         data = {
             "items": data 
         }
-        return data
\ No newline at end of file
+        return data
+
+    @staticmethod
+    def serialize_page(data, next_cursor):
+        data = {
+            "items": data,
+            "next_cursor": next_cursor
+        }
+        return data
+
+    @staticmethod
+    async def serialize_ndjson(data):
+        async for item in data:
+            yield json.dumps(item) + "\n"
@@ -0,0 +1,129 @@
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+import pytest
+import uvicorn
+
+from dependencies.climate_api import ClimateApi
+from helpers import meteoblueStub
+
+
+def listening_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen()
+    return sock
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Sobe helpers/meteoblueStub.py numa thread e registra, para cada requisição recebida,
+    o endereço do cliente (a porta identifica a conexão) e o caminho pedido.
+    """
+    requests = []
+
+    async def app(scope, receive, send):
+        if scope["type"] == "http":
+            requests.append((scope["client"], scope["path"]))
+        await meteoblueStub.app(scope, receive, send)
+
+    sock = listening_socket()
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    host, port = sock.getsockname()
+    yield f"http://{host}:{port}", requests
+
+    server.should_exit = True
+    thread.join(timeout=5)
+    sock.close()
+
+
+def climate_api(base_url, **kwargs):
+    api = ClimateApi(base_url=base_url, **kwargs)
+    api.api_secret = "chave"
+    api.shared_secret = "segredo"
+    return api
+
+
+def test_fetch_reuses_pooled_connections(stub_server):
+    base_url, requests = stub_server
+    api = climate_api(base_url, max_connections=2, max_concurrency=2)
+
+    async def fetch():
+        sequential = [await api.fetch_forecast_async(-3.0 - i, -60.0) for i in range(3)]
+        concurrent = await asyncio.gather(*(api.fetch_forecast_async(-10.0 - i, -55.0) for i in range(6)))
+        # Pedidos simultâneos para a mesma coordenada compartilham uma única busca
+        same = await asyncio.gather(*(api.fetch_forecast_async(-20.0, -50.0) for _ in range(4)))
+        await api.aclose()
+        return sequential + concurrent + same
+
+    results = asyncio.run(fetch())
+
+    assert [result["metadata"]["latitude"] for result in results[:9]] == [-3.0, -4.0, -5.0, *range(-10, -16, -1)]
+    assert all(len(result["data_1h"]["time"]) == 168 for result in results)
+    assert len(requests) == 3 + 6 + 1
+    assert all(path == "/packages/basic-1h" for _, path in requests)
+
+    # As buscas em sequência usam a mesma conexão, e as demais não passam do limite do pool
+    clients = [client for client, _ in requests]
+    assert len(set(clients[:3])) == 1
+    assert len(set(clients)) <= 2
+
+
+def test_fetch_raises_upstream_errors(stub_server):
+    base_url, requests = stub_server
+    api = climate_api(f"{base_url}/inexistente", max_concurrency=1)
+
+    async def fetch():
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError) as error:
+                await api.fetch_forecast_async(-3.0, -60.0)
+            assert error.value.response.status_code == 404
+
+        # Uma resposta de erro não fica no cache nem prende o semáforo
+        api.base_url = base_url
+        data = await asyncio.wait_for(api.fetch_forecast_async(-3.0, -60.0), 5)
+        await api.aclose()
+        return data
+
+    data = asyncio.run(fetch())
+
+    assert data["metadata"]["latitude"] == -3.0
+    assert len(requests) == 3
+    assert api._inflight == {}
+
+
+def test_fetch_times_out(stub_server):
+    base_url, requests = stub_server
+    # Aceita a conexão mas nunca responde
+    silent = listening_socket()
+    host, port = silent.getsockname()
+    api = climate_api(f"http://{host}:{port}", max_concurrency=1, timeout=0.2)
+
+    async def fetch():
+        started = time.perf_counter()
+        with pytest.raises(httpx.TimeoutException):
+            await api.fetch_forecast_async(-3.0, -60.0)
+        elapsed = time.perf_counter() - started
+
+        api.base_url = base_url
+        data = await asyncio.wait_for(api.fetch_forecast_async(-3.0, -60.0), 5)
+        await api.aclose()
+        return elapsed, data
+
+    try:
+        elapsed, data = asyncio.run(fetch())
+    finally:
+        silent.close()
+
+    assert elapsed < 2
+    assert data["metadata"]["latitude"] == -3.0
+    assert len(requests) == 1
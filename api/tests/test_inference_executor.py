@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pandas as pd
+import pytest
+
+from dependencies import inference_executor as executor_module
+from dependencies.inference_executor import InferenceBusyError, InferenceExecutor
+
+
+class SlowModel:
+    model_path = "lento.pkl"
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict_many(self, input_data):
+        self.release.wait(5)
+        return [0] * len(input_data)
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    model = SlowModel()
+    monkeypatch.setattr(executor_module.model_registry, "get", lambda model_path=None: model)
+    yield model
+    model.release.set()
+
+
+def test_rejected_and_cancelled_waits_give_back_their_slots(slow_model):
+    executor = InferenceExecutor(max_workers=1, max_pending=1, queue_timeout=0.1)
+    rows = pd.DataFrame({"lat": [-3.0]})
+
+    async def run():
+        running = asyncio.create_task(executor.predict_many(rows))
+        await asyncio.sleep(0.05)
+
+        # Sem vaga: um espera até o queue_timeout e o outro é cancelado enquanto espera
+        with pytest.raises(InferenceBusyError):
+            await executor.predict_many(rows)
+        cancelled = asyncio.create_task(executor.predict_many(rows))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+        slow_model.release.set()
+        assert await running == [0]
+
+        # Se alguma vaga tivesse ficado presa, estas chamadas seriam recusadas
+        executor.queue_timeout = 1
+        results = [await executor.predict_many(rows) for _ in range(3)]
+        await asyncio.sleep(0)
+        return results
+
+    try:
+        assert asyncio.run(run()) == [[0]] * 3
+    finally:
+        executor.shutdown()
+
+    assert executor.rejected == 1
+    assert executor.completed == 4
+    assert executor.pending == 0
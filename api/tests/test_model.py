@@ -0,0 +1,54 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from dependencies.model import Model
+
+COLUMNS = ["lat", "lon", "numero_dias_sem_chuva", "precipitacao", "month", "day_of_year"]
+
+
+def requests(rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "lat": rng.uniform(-10, 0, rows).round(4),
+        "lon": rng.uniform(-60, -50, rows).round(4),
+        "data_pas": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 366, rows), unit="D"),
+        "numero_dias_sem_chuva": rng.integers(0, 60, rows),
+        "precipitacao": rng.exponential(5, rows).round(2),
+    })
+
+
+def export(model, tmp_path, name):
+    # Como main/train.py `save_model`
+    pickle_path = tmp_path / f"{name}.pkl"
+    onnx_path = tmp_path / f"{name}.onnx"
+    joblib.dump(model, pickle_path)
+    onnx_model = convert_sklearn(model, initial_types=[("float_input", FloatTensorType([None, len(COLUMNS)]))])
+    onnx_path.write_bytes(onnx_model.SerializeToString())
+    return str(pickle_path), str(onnx_path)
+
+
+@pytest.mark.parametrize("estimator", [
+    RandomForestClassifier(n_estimators=20, random_state=0),
+    LogisticRegression(max_iter=1000),
+])
+def test_onnx_export_matches_pickle(tmp_path, estimator):
+    train = requests(500, seed=0)
+    features = train.assign(
+        month=train["data_pas"].dt.month, day_of_year=train["data_pas"].dt.dayofyear
+    )[COLUMNS]
+    target = (features["precipitacao"] < 2) & (features["numero_dias_sem_chuva"] > 10)
+    pickle_path, onnx_path = export(estimator.fit(features, target.astype(int)), tmp_path, "modelo")
+
+    parity = Model.check_parity(pickle_path, onnx_path, requests(2000, seed=1))
+
+    assert parity["rows"] == 2000
+    assert parity["mismatches"] == 0
+
+    # Também com as features já montadas, como main/train.py confere a exportação
+    assert Model.check_parity(pickle_path, onnx_path, features)["mismatches"] == 0
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import joblib
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+from sqlalchemy.future import select
+
+from db import Base, SessionLocal, engine
+from dependencies.feature_scaling import feature_scaling
+from dependencies.model_registry import model_registry
+from helpers.drySpellIndex import DrySpellIndex
+from helpers.materializeFireRisk import MaterializeFireRisk
+from helpers.processManyStates import ProcessManyStates
+from models import ApiForecastItem, FireRisk, PayloadBody, State
+
+COLUMNS = ["lat", "lon", "numero_dias_sem_chuva", "precipitacao", "month", "day_of_year"]
+
+
+@pytest.fixture
+def trained_model(tmp_path):
+    # Treinado com as features normalizadas: incêndio (1) quando precipitacao < 0.5
+    precipitacao = [0.0, 0.1, 0.2, 0.3, 0.7, 0.8, 0.9, 1.0]
+    X = pd.DataFrame({
+        "lat": 0.5,
+        "lon": 0.5,
+        "numero_dias_sem_chuva": 0.5,
+        "precipitacao": precipitacao,
+        "month": 8,
+        "day_of_year": 220,
+    })[COLUMNS]
+    y = [1 if value < 0.5 else 0 for value in precipitacao]
+    model_path = tmp_path / "model.pkl"
+    joblib.dump(DecisionTreeClassifier(random_state=0).fit(X, y), model_path)
+
+    params_path = tmp_path / "preprocess_params.json"
+    limites = {"lat": (-10.0, 0.0), "lon": (-60.0, -50.0), "numero_dias_sem_chuva": (0, 100), "precipitacao": (0.0, 100.0)}
+    params_path.write_text(json.dumps({"estados": {"PA": {
+        "minimo": {column: low for column, (low, _) in limites.items()},
+        "maximo": {column: high for column, (_, high) in limites.items()},
+    }}}))
+
+    model_registry.load(str(model_path))
+    feature_scaling.load(str(params_path))
+    return model_path
+
+
+def test_score_points_scales_raw_inputs(trained_model):
+    points = [
+        # 10 mm normaliza para 0.1: risco
+        PayloadBody(lat=-5, lon=-55, date=datetime(2024, 8, 7), numero_dias_sem_chuva=30, precipitacao=10),
+        # 80 mm normaliza para 0.8: sem risco
+        PayloadBody(lat=-5, lon=-55, date=datetime(2024, 8, 7), numero_dias_sem_chuva=30, precipitacao=80),
+    ]
+
+    results = asyncio.run(ProcessManyStates.score_points(points))
+
+    assert [result["result"] for result in results] == ["1", "0"]
+    assert results[0] == {"result": "1", "lat": -5, "lon": -55, "date": "2024-08-07 00:00"}
+
+
+async def materialize(precipitacoes):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    DrySpellIndex.reset()
+
+    inicio = datetime(2024, 8, 7)
+    async with SessionLocal() as session:
+        session.add(State(id=1, name="Teste", lat=-5, lon=-55))
+        session.add_all([
+            ApiForecastItem(
+                modelrun="2024-08-06 00:00",
+                date_forecast=inicio + timedelta(hours=hora),
+                precipitation=precipitacao,
+                state_id=1,
+            )
+            for hora, precipitacao in enumerate(precipitacoes)
+        ])
+        await session.commit()
+
+    await MaterializeFireRisk.run(state_ids=[1])
+    async with SessionLocal() as session:
+        rows = (await session.execute(select(FireRisk).order_by(FireRisk.date_forecast))).scalars().all()
+    await engine.dispose()
+    return rows
+
+
+def test_materialized_risk_matches_score_points(trained_model):
+    rows = asyncio.run(materialize([10, 80, 0, 100]))
+
+    points = [
+        PayloadBody(
+            lat=-5,
+            lon=-55,
+            date=row.date_forecast,
+            numero_dias_sem_chuva=row.numero_dias_sem_chuva,
+            precipitacao=row.precipitation,
+        )
+        for row in rows
+    ]
+    results = asyncio.run(ProcessManyStates.score_points(points))
+
+    assert [str(row.result) for row in rows] == [result["result"] for result in results]
+    assert [row.result for row in rows] == [1, 0, 1, 0]
@@ -11,6 +11,18 @@ class AmazoniaLegal:
         "RORAIMA": "RR",
         "TOCANTINS": "TO",
     }
+
+    # Coordenadas (lat, lon) das capitais, usadas como ponto de previsão de cada estado
+    capitais = {
+        "AC": (-9.97499, -67.8243),
+        "AM": (-3.11703, -60.0257),
+        "AP": (0.034934, -51.0694),
+        "MT": (-15.6014, -56.0979),
+        "PA": (-1.45502, -48.5024),
+        "RO": (-8.76077, -63.8999),
+        "RR": (2.81972, -60.6733),
+        "TO": (-10.1689, -48.3317),
+    }
     
     @classmethod
     def get_paths(cls):
@@ -1,18 +1,35 @@
 import os
+import re
+import sys
+import argparse
 import pandas as pd
 from amazonia_legal import AmazoniaLegal
+from dataset_io import dataset_path, write_dataset
+from state_runner import add_jobs_argument, run_states
 
-def consolidate_csv_in_directory(directory):
+# Arquivos anuais (..._ref_2023.csv) e mensais (..._ref_202501.csv) do INPE
+PADRAO_CSV = re.compile(r"ref_\d{4}(\d{2})?\.csv$")
+
+
+def list_state_csvs(directory):
     """
-    Lê todos os arquivos .csv em um diretório que seguem o padrão ref_2023 ou ref_2024,
-    concatena-os e salva um consolidado.csv, mantendo as colunas estado e municipio.
+    Arquivos .csv do diretório que seguem o padrão ref_AAAA ou ref_AAAAMM, em ordem de nome.
     """
-    # Filtrar arquivos pelo padrão ref_2023.csv ou ref_2024.csv
-    csv_files = [
+    return sorted(
         os.path.join(directory, f)
         for f in os.listdir(directory)
-        if f.endswith("ref_2023.csv") or f.endswith("ref_2024.csv")
-    ]
+        if PADRAO_CSV.search(f)
+    )
+
+
+def concatenate_state_csvs(directory, csv_files=None):
+    """
+    Lê todos os arquivos .csv em um diretório que seguem o padrão ref_AAAA ou ref_AAAAMM
+    (ou só `csv_files`, se informados) e retorna a concatenação deles, mantendo as colunas
+    estado e municipio. Retorna None se não houver arquivos.
+    """
+    if csv_files is None:
+        csv_files = list_state_csvs(directory)
 
     if not csv_files:
         print(f"Nenhum arquivo CSV correspondente ao padrão encontrado em {directory}.")
@@ -34,25 +51,38 @@ def consolidate_csv_in_directory(directory):
             dataframes.append(df)
 
     # Concatena todos os DataFrames em um único
-    consolidated_df = pd.concat(dataframes, ignore_index=True)
+    return pd.concat(dataframes, ignore_index=True)
+
+
+def consolidate_csv_in_directory(directory):
+    """
+    Concatena os CSVs do diretório (veja `concatenate_state_csvs`) e salva o dataset consolidado.
+    """
+    consolidated_df = concatenate_state_csvs(directory)
+    if consolidated_df is None:
+        return
 
     # Salva o arquivo consolidado
-    output_file = os.path.join(directory, "consolidado.csv")
-    consolidated_df.to_csv(output_file, index=False)
+    output_file = write_dataset(consolidated_df, dataset_path(directory, "consolidado"))
     print(f"Arquivo consolidado salvo em {output_file}.")
 
-def consolidate_amazonia_legal():
+def consolidate_amazonia_legal(jobs=None):
     """
-    Itera por todas as pastas da Amazônia Legal e cria um consolidado.csv em cada uma.
+    Cria um consolidado em cada pasta da Amazônia Legal, `jobs` estados por vez.
     """
     base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados"))
 
+    tasks = {}
     for path in AmazoniaLegal.get_paths():
         relative_path = os.path.join(base_path, os.path.basename(path))
         if os.path.exists(relative_path):
-            consolidate_csv_in_directory(relative_path)
+            tasks[os.path.basename(path)] = (relative_path,)
         else:
             print(f"Diretório não encontrado: {relative_path}")
 
+    return run_states(consolidate_csv_in_directory, tasks, jobs=jobs)
+
 if __name__ == "__main__":
-    consolidate_amazonia_legal()
+    args = add_jobs_argument(argparse.ArgumentParser(description="Concatena os CSVs de cada estado.")).parse_args()
+    results = consolidate_amazonia_legal(jobs=args.jobs)
+    sys.exit(1 if any(result["status"] == "erro" for result in results) else 0)
@@ -0,0 +1,104 @@
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Quando ligado, cada dataset salvo também é exportado em .csv ao lado do .parquet
+EXPORTAR_CSV = os.getenv("EXPORTAR_CSV", "0").lower() in ("1", "true", "yes")
+COMPRESSAO = os.getenv("PARQUET_COMPRESSAO", "zstd")
+
+# Tipos das colunas conhecidas de cada dataset; colunas fora daqui mantêm o tipo do pandas
+SCHEMAS = {
+    "consolidado": {
+        "foco_id": pa.string(),
+        "lat": pa.float64(),
+        "lon": pa.float64(),
+        "data_pas": pa.timestamp("ns"),
+        "pais": pa.string(),
+        "estado": pa.string(),
+        "municipio": pa.string(),
+        "bioma": pa.string(),
+        "numero_dias_sem_chuva": pa.float64(),
+        "precipitacao": pa.float64(),
+        "target": pa.string(),
+    },
+    "consolidado_processado": {
+        "lat": pa.float64(),
+        "lon": pa.float64(),
+        "data_pas": pa.timestamp("ns"),
+        "numero_dias_sem_chuva": pa.float64(),
+        "precipitacao": pa.float64(),
+        "target": pa.string(),
+    },
+}
+# Etapas intermediárias do pipeline (main/pipeline.py) e o estado da atualização incremental
+# (main/incremental.py) têm as mesmas colunas do consolidado
+for alias in ("consolidado_bruto", "consolidado_rotulado", "focos_clusterizados", "nao_incendio"):
+    SCHEMAS[alias] = SCHEMAS["consolidado"]
+
+
+def dataset_path(directory, name):
+    """
+    Caminho base (sem extensão) do dataset `name` dentro de `directory`.
+    """
+    return os.path.join(directory, name)
+
+
+def _schema_for(path, df):
+    types = SCHEMAS.get(os.path.basename(path), {})
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([
+        pa.field(field.name, types.get(field.name, field.type)) for field in inferred
+    ])
+
+
+def dataset_exists(path):
+    return os.path.exists(f"{path}.parquet") or os.path.exists(f"{path}.csv")
+
+
+def read_dataset(path, columns=None):
+    """
+    Lê o dataset em Parquet. Se só existir a versão .csv (dados gerados antes do Parquet),
+    lê o CSV e converte `data_pas` para datetime.
+    """
+    if os.path.exists(f"{path}.parquet"):
+        return pd.read_parquet(f"{path}.parquet", columns=columns)
+
+    df = pd.read_csv(f"{path}.csv", usecols=columns)
+    if "data_pas" in df.columns:
+        df["data_pas"] = pd.to_datetime(df["data_pas"])
+    return df
+
+
+def apply_schema(df, name):
+    """
+    Cópia de `df` com as colunas convertidas para os tipos de SCHEMAS[name], para juntar
+    dados novos com os lidos do disco.
+    """
+    df = df.copy()
+    for column, column_type in SCHEMAS.get(name, {}).items():
+        if column not in df.columns:
+            continue
+        if pa.types.is_timestamp(column_type):
+            df[column] = pd.to_datetime(df[column])
+        elif pa.types.is_string(column_type) and pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].astype("string")
+    return df
+
+
+def write_dataset(df, path, exportar_csv=None):
+    """
+    Salva o dataset em Parquet com o schema de SCHEMAS e, se pedido, exporta também em CSV.
+    """
+    df = apply_schema(df, os.path.basename(path))
+    table = pa.Table.from_pandas(df, schema=_schema_for(path, df), preserve_index=False)
+    if df.attrs:
+        # Mesma chave do DataFrame.to_parquet: o pandas restaura os attrs na leitura
+        metadata = {**(table.schema.metadata or {}), b"PANDAS_ATTRS": json.dumps(df.attrs).encode()}
+        table = table.replace_schema_metadata(metadata)
+    pq.write_table(table, f"{path}.parquet", compression=COMPRESSAO)
+
+    if exportar_csv if exportar_csv is not None else EXPORTAR_CSV:
+        df.to_csv(f"{path}.csv", index=False)
+    return f"{path}.parquet"
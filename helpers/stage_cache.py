@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import inspect
+from dataset_io import dataset_exists, dataset_path, read_dataset, write_dataset
+
+MANIFEST_NAME = "pipeline_manifest.json"
+
+
+def hash_files(paths):
+    """
+    Hash do conteúdo de uma lista de arquivos (a ordem não importa).
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_code(*funcs):
+    """
+    Hash do código-fonte dos módulos que definem `funcs`, para invalidar o cache quando
+    uma etapa muda.
+    """
+    digest = hashlib.sha256()
+    for module in sorted({func.__module__ for func in funcs}):
+        digest.update(inspect.getsource(sys.modules[module]).encode())
+    return digest.hexdigest()
+
+
+def stage_key(stage_name, code, input_keys, params=None):
+    payload = json.dumps(
+        {"stage": stage_name, "code": code, "inputs": input_keys, "params": params or {}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def read_manifest(directory, name=MANIFEST_NAME):
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return {"stages": {}, "checkpoints": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(directory, manifest, name=MANIFEST_NAME):
+    path = os.path.join(directory, name)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+class StageCache:
+    """
+    Guarda a saída de cada etapa do pipeline em `cache_dir/<chave>/`, onde a chave é o hash
+    das entradas e do código da etapa. Quando passa de `max_bytes`, `evict` remove as
+    entradas usadas há mais tempo.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def has(self, key, artifact):
+        return dataset_exists(dataset_path(self._entry(key), artifact))
+
+    def load(self, key, artifact):
+        # O mtime da pasta marca o último uso, usado na remoção
+        os.utime(self._entry(key))
+        return read_dataset(dataset_path(self._entry(key), artifact))
+
+    def store(self, df, key, artifact):
+        entry = self._entry(key)
+        os.makedirs(entry, exist_ok=True)
+        write_dataset(df, dataset_path(entry, artifact), exportar_csv=False)
+
+    @staticmethod
+    def _size(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(path)
+            for name in files
+        )
+
+    def evict(self):
+        """
+        Remove as entradas usadas há mais tempo até o cache caber em `max_bytes`.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            path = self._entry(key)
+            if os.path.isdir(path):
+                entries.append((os.path.getmtime(path), self._size(path), path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed.append(os.path.basename(path))
+        return removed
@@ -0,0 +1,70 @@
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+# Argumentos comuns a todos os estados, enviados uma vez para cada processo do pool
+_common = {}
+
+
+def _init_worker(common):
+    global _common
+    _common = common
+
+
+def _run_state(task, sigla, args):
+    started = time.perf_counter()
+    try:
+        task(*args, **_common)
+        return {"estado": sigla, "status": "ok", "segundos": time.perf_counter() - started, "erro": None}
+    except Exception:
+        return {
+            "estado": sigla,
+            "status": "erro",
+            "segundos": time.perf_counter() - started,
+            "erro": traceback.format_exc(),
+        }
+
+
+def default_jobs(states_count):
+    return max(1, min(os.cpu_count() or 1, states_count))
+
+
+def run_states(task, tasks, jobs=None, **common):
+    """
+    Executa `task(*args, **common)` para cada estado de `tasks` ({sigla: args}) em um pool
+    de processos com `jobs` processos (um por núcleo, no máximo um por estado, por padrão).
+
+    Uma falha em um estado não interrompe os outros: o erro é guardado no resultado e
+    impresso no resumo. Retorna a lista de resultados na ordem de `tasks`.
+    """
+    jobs = jobs or default_jobs(len(tasks))
+    started = time.perf_counter()
+
+    if jobs == 1 or len(tasks) <= 1:
+        _init_worker(common)
+        results = [_run_state(task, sigla, args) for sigla, args in tasks.items()]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(common,)) as executor:
+            futures = [executor.submit(_run_state, task, sigla, args) for sigla, args in tasks.items()]
+            results = [future.result() for future in futures]
+
+    print_summary(results, time.perf_counter() - started, jobs)
+    return results
+
+
+def print_summary(results, total_seconds, jobs):
+    print(f"\nResumo ({jobs} processo(s), {total_seconds:.2f}s no total):")
+    for result in results:
+        print(f"  {result['estado']:<4} {result['status']:<5} {result['segundos']:8.2f}s")
+    for result in results:
+        if result["erro"]:
+            print(f"\nErro em {result['estado']}:\n{result['erro']}")
+
+
+def add_jobs_argument(parser):
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="Número de estados processados em paralelo (padrão: um por núcleo)"
+    )
+    return parser
@@ -1,9 +1,12 @@
 import sys
 import os
+import argparse
 import pandas as pd
 from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "helpers")))
 from amazonia_legal import AmazoniaLegal
+from dataset_io import dataset_exists, dataset_path, read_dataset, write_dataset
+from state_runner import add_jobs_argument, run_states
 
 
 def process_focos_directory(directory):
@@ -32,24 +35,17 @@ def process_focos_directory(directory):
     return pd.concat(processed_data, ignore_index=True)
 
 
-def match_and_update_consolidado(consolidado_path, focos_data):
-    """
-    Faz o cruzamento do consolidado com os dados de focos e adiciona as colunas `numero_dias_sem_chuva` e `precipitacao`.
-    """
-    if not os.path.exists(consolidado_path):
-        print(f"Arquivo não encontrado: {consolidado_path}")
-        return
+REQUIRED_COLUMNS = ["municipio", "estado", "lat", "lon", "data_pas"]
 
-    print(f"Carregando {consolidado_path}...")
 
-    # Carrega o consolidado
-    consolidado = pd.read_csv(consolidado_path)
-
-    # Verifica se as colunas obrigatórias estão presentes
-    required_columns = ["municipio", "estado", "lat", "lon", "data_pas"]
-    if not all(col in consolidado.columns for col in required_columns):
-        print(f"Arquivo {consolidado_path} não contém todas as colunas necessárias: {required_columns}")
-        return
+def merge_focos(consolidado, focos_data):
+    """
+    Adiciona ao consolidado as colunas `numero_dias_sem_chuva` e `precipitacao` dos focos
+    com o mesmo municipio, estado, lat, lon e data.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in consolidado.columns]
+    if missing:
+        raise ValueError(f"Consolidado sem as colunas necessárias: {missing}")
 
     # Converte as colunas de data para datetime
     consolidado["data_pas"] = pd.to_datetime(consolidado["data_pas"])
@@ -62,20 +58,42 @@ def match_and_update_consolidado(consolidado_path, focos_data):
     merged = pd.merge(
         consolidado,
         focos_data,
-        on=["municipio", "estado", "lat", "lon", "data_pas"],
+        on=REQUIRED_COLUMNS,
         how="left"
     )
 
     # Preenche valores faltantes
     merged["numero_dias_sem_chuva"] = merged["numero_dias_sem_chuva"].fillna(0).astype(int)
     merged["precipitacao"] = merged["precipitacao"].fillna(0).astype(float)
+    return merged
+
+
+def match_and_update_consolidado(consolidado_path, focos_data):
+    """
+    Faz o cruzamento do consolidado com os dados de focos e adiciona as colunas `numero_dias_sem_chuva` e `precipitacao`.
+    """
+    if not dataset_exists(consolidado_path):
+        print(f"Arquivo não encontrado: {consolidado_path}")
+        return
+
+    print(f"Carregando {consolidado_path}...")
+
+    # Carrega o consolidado
+    consolidado = read_dataset(consolidado_path)
+
+    # Verifica se as colunas obrigatórias estão presentes
+    if not all(col in consolidado.columns for col in REQUIRED_COLUMNS):
+        print(f"Arquivo {consolidado_path} não contém todas as colunas necessárias: {REQUIRED_COLUMNS}")
+        return
+
+    merged = merge_focos(consolidado, focos_data)
 
     # Salva o arquivo consolidado atualizado
-    merged.to_csv(consolidado_path, index=False)
-    print(f"Arquivo atualizado salvo em: {consolidado_path}")
+    output_file = write_dataset(merged, consolidado_path)
+    print(f"Arquivo atualizado salvo em: {output_file}")
 
 
-def main():
+def main(jobs=None):
     # Caminho para os arquivos focos
     focos_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados", "focos"))
     print("Processando arquivos de focos...")
@@ -83,18 +101,23 @@ def main():
     # Processa os arquivos da pasta focos
     focos_data = process_focos_directory(focos_directory)
 
-    # Caminho base para consolidado.csv
+    # Caminho base para o consolidado
     base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados"))
 
     # Itera sobre cada estado na Amazônia Legal
+    tasks = {}
     for state_path in AmazoniaLegal.get_paths():
-        relative_path = os.path.join(base_path, os.path.basename(state_path), "consolidado.csv")
-        if os.path.exists(relative_path):
-            print(f"Atualizando {relative_path}...")
-            match_and_update_consolidado(relative_path, focos_data)
+        relative_path = dataset_path(os.path.join(base_path, os.path.basename(state_path)), "consolidado")
+        if dataset_exists(relative_path):
+            tasks[os.path.basename(state_path)] = (relative_path,)
         else:
-            print(f"Arquivo consolidado.csv não encontrado em: {relative_path}")
+            print(f"Consolidado não encontrado em: {relative_path}")
+
+    # Os focos vão uma vez para cada processo, e não uma vez por estado
+    return run_states(match_and_update_consolidado, tasks, jobs=jobs, focos_data=focos_data)
 
 
 if __name__ == "__main__":
-    main()
+    args = add_jobs_argument(argparse.ArgumentParser(description="Adiciona os dados de focos aos consolidados.")).parse_args()
+    results = main(jobs=args.jobs)
+    sys.exit(1 if any(result["status"] == "erro" for result in results) else 0)
@@ -0,0 +1,84 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "helpers")))
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import adjusted_rand_score
+from amazonia_legal import AmazoniaLegal
+from dataset_io import dataset_exists, dataset_path, read_dataset
+from data_engineering import METODOS_CLUSTER, greedy_clusters, haversine_km, neighbor_query
+
+
+def benchmark_state(path, max_distance_km=100, amostra=None):
+    """
+    Roda cada método de cluster no consolidado de um estado e mede tempo e qualidade.
+
+    A qualidade é medida contra a distância geodésica: para cada ponto, a distância até a
+    semente do seu cluster. Em um agrupamento correto nenhum ponto passa de `max_distance_km`.
+    """
+    df = read_dataset(path)
+    if "target" in df.columns:
+        df = df[df["target"] == "incendio"]
+    if amostra is not None and len(df) > amostra:
+        df = df.sample(amostra, random_state=0).sort_index()
+    coords = df[["lat", "lon"]].to_numpy(dtype=float)
+
+    results = []
+    labels = {}
+    for metodo in METODOS_CLUSTER:
+        started = time.perf_counter()
+        cluster_ids, seeds = greedy_clusters(len(coords), neighbor_query(coords, max_distance_km, metodo))
+        seconds = time.perf_counter() - started
+
+        seed_of_point = seeds[cluster_ids]
+        distancia = haversine_km(
+            coords[:, 0], coords[:, 1], coords[seed_of_point, 0], coords[seed_of_point, 1]
+        )
+        tamanhos = np.bincount(cluster_ids)
+        labels[metodo] = cluster_ids
+        results.append({
+            "metodo": metodo,
+            "pontos": len(coords),
+            "segundos": round(seconds, 4),
+            "clusters": len(seeds),
+            "maior_cluster": int(tamanhos.max()) if len(tamanhos) else 0,
+            "distancia_max_km": round(float(distancia.max()), 2) if len(distancia) else 0.0,
+            "fora_do_raio": round(float((distancia > max_distance_km + 1e-6).mean()), 4) if len(distancia) else 0.0,
+        })
+
+    for result in results:
+        result["ari_vs_haversine"] = round(adjusted_rand_score(labels["haversine"], labels[result["metodo"]]), 4)
+    return results
+
+
+def benchmark_all_states(max_distance_km=100, amostra=None):
+    base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados"))
+    rows = []
+
+    for path in AmazoniaLegal.get_paths():
+        sigla = os.path.basename(path)
+        consolidado_path = dataset_path(os.path.join(base_path, sigla), "consolidado")
+        if not dataset_exists(consolidado_path):
+            print(f"Consolidado não encontrado em: {consolidado_path}")
+            continue
+
+        print(f"Comparando métodos de cluster em {consolidado_path}...")
+        for result in benchmark_state(consolidado_path, max_distance_km, amostra):
+            rows.append({"estado": sigla, **result})
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara os métodos de cluster por estado.")
+    parser.add_argument("--raio", type=float, default=100, help="Distância máxima em km (padrão: 100)")
+    parser.add_argument("--amostra", type=int, default=None, help="Usa no máximo N focos por estado")
+    parser.add_argument("--saida", default=None, help="Salva o resultado em CSV")
+    args = parser.parse_args()
+
+    resultado = benchmark_all_states(args.raio, args.amostra)
+    print(resultado.to_string(index=False))
+    if args.saida:
+        resultado.to_csv(args.saida, index=False)
@@ -1,119 +1,224 @@
 import sys
 import os
+import argparse
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "helpers")))
 import pandas as pd
-import geopandas as gpd
-from datetime import timedelta
 from scipy.spatial import cKDTree
 import numpy as np
 from amazonia_legal import AmazoniaLegal
+from dataset_io import dataset_exists, dataset_path, read_dataset, write_dataset
+from state_runner import add_jobs_argument, run_states
 
 
-def cluster_by_distance(df, max_distance_km=100):
+RAIO_TERRA_KM = 6371.0088
+KM_POR_GRAU = 110.574  # 1° ≈ 110.574 km
+METODOS_CLUSTER = ("haversine", "projetado", "graus")
+# Método usado pelos scripts quando --metodo não é informado
+METODO_CLUSTER_PADRAO = os.getenv("METODO_CLUSTER", "haversine")
+
+
+def project_equal_area(lat, lon, lat0=None, lon0=None):
     """
-    Agrupa pontos de incêndio com base na distância geográfica usando cKDTree.
+    Projeção azimutal equivalente de Lambert (esfera) em km, centrada em (lat0, lon0).
+
+    Por padrão o centro é o meio da extensão dos pontos. Perto do centro as distâncias
+    ficam próximas das geodésicas, o que basta para raios de ~100 km dentro de um estado.
     """
-    coords = np.array([(row.lat, row.lon) for _, row in df.iterrows()])
-    tree = cKDTree(coords)
-    clusters = tree.query_ball_tree(tree, max_distance_km / 110.574)  # 1° ≈ 110.574 km
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat0 = (lat.min() + lat.max()) / 2 if lat0 is None else np.radians(lat0)
+    lon0 = (lon.min() + lon.max()) / 2 if lon0 is None else np.radians(lon0)
 
-    # Mapeia cada ponto a um cluster
-    cluster_ids = [-1] * len(df)
-    cluster_counter = 0
+    cos_c = np.sin(lat0) * np.sin(lat) + np.cos(lat0) * np.cos(lat) * np.cos(lon - lon0)
+    k = np.sqrt(2 / (1 + cos_c))
+    x = RAIO_TERRA_KM * k * np.cos(lat) * np.sin(lon - lon0)
+    y = RAIO_TERRA_KM * k * (np.cos(lat0) * np.sin(lat) - np.sin(lat0) * np.cos(lat) * np.cos(lon - lon0))
+    return np.column_stack([x, y])
 
-    for i, points in enumerate(clusters):
-        if cluster_ids[i] == -1:  # Não foi agrupado ainda
-            for p in points:
-                cluster_ids[p] = cluster_counter
-            cluster_counter += 1
 
-    df["cluster"] = cluster_ids
-    return df
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(a))
 
 
-def generate_nao_incendio(df):
+def neighbor_query(coords, max_distance_km=100, metodo="haversine"):
     """
-    Gera registros `não_incendio` com base nos intervalos de tempo sem incêndios em cada cluster.
+    Retorna uma função que, dado o índice de um ponto, lista os índices a até
+    `max_distance_km` dele.
+
+    - "haversine": BallTree com distância de grande círculo (exata na esfera);
+    - "projetado": cKDTree sobre a projeção equivalente, mais rápido e quase igual;
+    - "graus": cKDTree em graus com 1° ≈ 110.574 km, o comportamento antigo.
     """
-    nao_incendio_rows = []
+    if metodo == "haversine":
+        from sklearn.neighbors import BallTree
 
-    for cluster_id, group in df.groupby("cluster"):
-        group = group.sort_values(by="data_pas")  # Ordena por data
-        group["data_pas"] = pd.to_datetime(group["data_pas"])
+        points = np.radians(coords)
+        tree = BallTree(points, metric="haversine")
+        radius = max_distance_km / RAIO_TERRA_KM
+        return lambda i: tree.query_radius(points[i:i + 1], r=radius)[0]
 
-        for i in range(len(group) - 1):
-            current_row = group.iloc[i]
-            next_row = group.iloc[i + 1]
+    if metodo == "projetado":
+        points = project_equal_area(coords[:, 0], coords[:, 1])
+        radius = max_distance_km
+    elif metodo == "graus":
+        points = coords
+        radius = max_distance_km / KM_POR_GRAU
+    else:
+        raise ValueError(f"Método de cluster desconhecido: {metodo} (use um de {METODOS_CLUSTER})")
 
-            # Calcula intervalo de tempo
-            interval_start = current_row["data_pas"]
-            interval_end = next_row["data_pas"]
+    tree = cKDTree(points)
+    return lambda i: tree.query_ball_point(points[i], radius)
 
-            # Se houver um intervalo de mais de um dia
-            if interval_end - interval_start > timedelta(days=1):
-                midpoint_lat = (current_row["lat"] + next_row["lat"]) / 2
-                midpoint_lon = (current_row["lon"] + next_row["lon"]) / 2
 
-                # Gera registros diários para o intervalo
-                current_date = interval_start + timedelta(days=1)
-                while current_date < interval_end:
-                    nao_incendio_rows.append({
-                        "lat": midpoint_lat,
-                        "lon": midpoint_lon,
-                        "data_pas": current_date,
-                        "target": "não_incendio"
-                    })
-                    current_date += timedelta(days=1)
+def greedy_clusters(n, neighbors):
+    """
+    Percorre os pontos em ordem; cada ponto ainda não agrupado vira semente de um novo
+    cluster, que recebe todos os seus vizinhos (inclusive os que já estavam em um cluster
+    anterior). Retorna o cluster de cada ponto e o índice da semente de cada cluster.
+    """
+    cluster_ids = np.full(n, -1, dtype=np.int64)
+    nao_agrupado = np.ones(n, dtype=bool)
+    seeds = []
+    i = 0
 
-    nao_incendio_df = pd.DataFrame(nao_incendio_rows)
-    return nao_incendio_df
+    while i < n:
+        # Próximo ponto ainda não agrupado (argmax para no primeiro True)
+        i += int(np.argmax(nao_agrupado[i:]))
+        if not nao_agrupado[i]:
+            break
+        points = neighbors(i)
+        cluster_ids[points] = len(seeds)
+        nao_agrupado[points] = False
+        seeds.append(i)
 
+    return cluster_ids, np.array(seeds, dtype=np.int64)
 
-def process_consolidado_file(csv_path):
+
+def cluster_by_distance(df, max_distance_km=100, metodo="haversine"):
     """
-    Processa o consolidado.csv para criar registros de `não_incendio`.
+    Agrupa pontos de incêndio que estão a até `max_distance_km` da semente do cluster.
+
+    Só as vizinhanças das sementes são consultadas, então a memória fica proporcional ao
+    número de pontos e não ao número de pares vizinhos. Veja `neighbor_query` para os métodos.
     """
-    if not os.path.exists(csv_path):
-        print(f"Arquivo não encontrado: {csv_path}")
-        return
+    coords = df[["lat", "lon"]].to_numpy(dtype=float)
+    cluster_ids, _ = greedy_clusters(len(df), neighbor_query(coords, max_distance_km, metodo))
+    df["cluster"] = cluster_ids
+    return df
 
-    print(f"Processando {csv_path}...")
 
-    # Carrega o arquivo CSV
-    df = pd.read_csv(csv_path)
+def generate_nao_incendio(df):
+    """
+    Gera registros `não_incendio` com base nos intervalos de tempo sem incêndios em cada cluster.
 
+    Para cada par de focos consecutivos (por data) do mesmo cluster separados por mais de um
+    dia, gera um registro por dia entre os dois, no ponto médio entre eles. Todos os dias são
+    gerados de uma vez com arrays do NumPy. Cada registro guarda o `cluster` de origem.
+    """
+    # O mesmo sort_values por cluster do cálculo original, para manter a ordem dos empates
+    por_cluster = list(df.groupby("cluster"))
+    grupos = [group.sort_values(by="data_pas") for _, group in por_cluster]
+    if not grupos:
+        return pd.DataFrame()
+    cluster_ids = np.array([cluster_id for cluster_id, _ in por_cluster])
+
+    datas = pd.to_datetime(pd.concat([group["data_pas"] for group in grupos])).to_numpy()
+    lat = np.concatenate([group["lat"].to_numpy() for group in grupos])
+    lon = np.concatenate([group["lon"].to_numpy() for group in grupos])
+    cluster = np.repeat(np.arange(len(grupos)), [len(group) for group in grupos])
+
+    um_dia = np.timedelta64(1, "D")
+    # Menor intervalo representável na resolução das datas
+    passo_minimo = np.timedelta64(1, np.datetime_data(datas.dtype)[0])
+
+    inicio, fim = datas[:-1], datas[1:]
+    intervalo = fim - inicio
+    pares = (cluster[:-1] == cluster[1:]) & ~np.isnat(inicio) & ~np.isnat(fim)
+    pares[pares] = intervalo[pares] > um_dia
+    pares = np.flatnonzero(pares)
+
+    # Quantidade de dias `inicio + k dias` (k >= 1) estritamente antes de `fim`
+    dias = ((intervalo[pares] - passo_minimo) // um_dia).astype(np.int64)
+    if dias.sum() == 0:
+        return pd.DataFrame()
+
+    par = np.repeat(pares, dias)
+    k = np.arange(dias.sum()) - np.repeat(np.cumsum(dias) - dias, dias) + 1
+
+    return pd.DataFrame({
+        "lat": (lat[par] + lat[par + 1]) / 2,
+        "lon": (lon[par] + lon[par + 1]) / 2,
+        "data_pas": inicio[par] + k * um_dia,
+        "target": "não_incendio",
+        "cluster": cluster_ids[cluster[par]],
+    })
+
+
+def add_nao_incendio(df, metodo=METODO_CLUSTER_PADRAO):
+    """
+    Marca os focos do consolidado como `incendio` e acrescenta os registros de `não_incendio`,
+    com os clusters calculados pelo `metodo` (veja `neighbor_query`).
+    """
     # Filtra as colunas relevantes
     df["data_pas"] = pd.to_datetime(df["data_pas"])
     df["target"] = "incendio"
 
     # Clusteriza por distância
-    df = cluster_by_distance(df)
+    df = cluster_by_distance(df, metodo=metodo)
 
     # Gera registros de `não_incendio`
     nao_incendio_df = generate_nao_incendio(df)
 
     # Combina registros de `incendio` e `não_incendio`
     combined_df = pd.concat([df, nao_incendio_df], ignore_index=True)
+    return combined_df.drop(columns=["cluster"], errors="ignore")
 
-    # Salva o consolidado atualizado
-    combined_df = combined_df.drop(columns=["cluster"], errors="ignore")
-    combined_df.to_csv(csv_path, index=False)
-    print(f"Arquivo atualizado salvo em: {csv_path}")
+
+def process_consolidado_file(path, metodo=METODO_CLUSTER_PADRAO):
+    """
+    Processa o consolidado para criar registros de `não_incendio`.
+    """
+    if not dataset_exists(path):
+        print(f"Arquivo não encontrado: {path}")
+        return
+
+    print(f"Processando {path}...")
+
+    # Carrega o consolidado e salva o consolidado atualizado
+    combined_df = add_nao_incendio(read_dataset(path), metodo)
+    output_file = write_dataset(combined_df, path)
+    print(f"Arquivo atualizado salvo em: {output_file}")
 
 
-def process_all_states():
+def process_all_states(jobs=None, metodo=METODO_CLUSTER_PADRAO):
     """
-    Itera por todas as pastas da Amazônia Legal e processa os arquivos `consolidado.csv`.
+    Processa os consolidados de todas as pastas da Amazônia Legal, `jobs` estados por vez.
     """
     base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados"))
 
+    tasks = {}
     for path in AmazoniaLegal.get_paths():
-        relative_path = os.path.join(base_path, os.path.basename(path), "consolidado.csv")
-        if os.path.exists(relative_path):
-            process_consolidado_file(relative_path)
+        relative_path = dataset_path(os.path.join(base_path, os.path.basename(path)), "consolidado")
+        if dataset_exists(relative_path):
+            tasks[os.path.basename(path)] = (relative_path, metodo)
         else:
-            print(f"Arquivo consolidado.csv não encontrado em: {relative_path}")
+            print(f"Consolidado não encontrado em: {relative_path}")
+
+    return run_states(process_consolidado_file, tasks, jobs=jobs)
+
+
+def add_metodo_argument(parser):
+    parser.add_argument(
+        "--metodo", choices=METODOS_CLUSTER, default=METODO_CLUSTER_PADRAO,
+        help="Método de cluster dos focos (padrão: METODO_CLUSTER ou haversine)"
+    )
+    return parser
 
 
 if __name__ == "__main__":
-    process_all_states()
+    parser = add_jobs_argument(argparse.ArgumentParser(description="Gera os registros de não incêndio."))
+    args = add_metodo_argument(parser).parse_args()
+    results = process_all_states(jobs=args.jobs, metodo=args.metodo)
+    sys.exit(1 if any(result["status"] == "erro" for result in results) else 0)
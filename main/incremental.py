@@ -0,0 +1,260 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "helpers")))
+import argparse
+import numpy as np
+import pandas as pd
+from amazonia_legal import AmazoniaLegal
+from dataset_io import apply_schema, dataset_exists, dataset_path, read_dataset, write_dataset
+from state_runner import add_jobs_argument, run_states
+from stage_cache import hash_files, read_manifest, write_manifest
+from concatenar_datasets import concatenate_state_csvs, list_state_csvs
+from add_labels import merge_focos, process_focos_directory
+from data_engineering import METODO_CLUSTER_PADRAO, add_metodo_argument, cluster_by_distance, generate_nao_incendio
+from preprocess_data import fit_preprocess, preprocess_dataframe
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados"))
+FOCOS_PATH = os.path.join(BASE_PATH, "focos")
+
+# Estado da atualização incremental, em dados/<estado>/incremental: os focos com o cluster de
+# cada um, os registros de não incêndio com o cluster de origem e o manifesto dos arquivos
+# já ingeridos (com os parâmetros do pré-processamento e o método de cluster da última reconstrução)
+PASTA_ESTADO = "incremental"
+MANIFESTO = "incremental_manifest.json"
+
+# Colunas que identificam um registro de não incêndio no consolidado_processado
+CHAVE_NAO_INCENDIO = ["lat", "lon", "data_pas", "target"]
+
+
+def file_hashes(directory):
+    return {os.path.basename(path): hash_files([path]) for path in list_state_csvs(directory)}
+
+
+def save_state(directory, focos, nao_incendio, processado, manifest):
+    pasta = os.path.join(directory, PASTA_ESTADO)
+    os.makedirs(pasta, exist_ok=True)
+    write_dataset(focos, dataset_path(pasta, "focos_clusterizados"), exportar_csv=False)
+    write_dataset(nao_incendio, dataset_path(pasta, "nao_incendio"), exportar_csv=False)
+
+    # O consolidado fica igual ao de data_engineering.py: os focos e depois os não incêndios
+    consolidado = pd.concat([focos, nao_incendio], ignore_index=True).drop(columns=["cluster"])
+    write_dataset(consolidado, dataset_path(directory, "consolidado"))
+    processado.attrs["preprocess_params"] = manifest["params"]
+    output_file = write_dataset(processado, dataset_path(directory, "consolidado_processado"))
+
+    # O manifesto vai por último: se algo falhar antes, a próxima execução refaz a atualização
+    write_manifest(pasta, manifest, MANIFESTO)
+    return output_file
+
+
+def rebuild_state(directory, focos_data, arquivos, metodo=METODO_CLUSTER_PADRAO):
+    """
+    Reconstrói o consolidado e o consolidado_processado do estado com todos os arquivos e
+    salva o estado da atualização incremental.
+    """
+    focos = merge_focos(concatenate_state_csvs(directory), focos_data)
+    focos["target"] = "incendio"
+    focos = cluster_by_distance(focos, metodo=metodo)
+    nao_incendio = generate_nao_incendio(focos)
+
+    consolidado = pd.concat([focos, nao_incendio], ignore_index=True).drop(columns=["cluster"])
+    processado, params = fit_preprocess(consolidado)
+
+    return save_state(
+        directory, focos, nao_incendio, processado, {"arquivos": arquivos, "params": params, "metodo": metodo}
+    )
+
+
+def changed_windows(focos, n_antigos, anterior):
+    """
+    Compara os clusters antes e depois da chegada dos focos novos (a partir de `n_antigos`).
+
+    Retorna os clusters que ganharam ou perderam focos antigos, que são refeitos inteiros, e,
+    para os que só ganharam focos novos, a janela (início, fim) entre o último foco antigo
+    antes do primeiro novo e o primeiro foco antigo depois do último novo. Fora dessa janela
+    os intervalos sem incêndio do cluster não mudam.
+    """
+    atual = focos["cluster"].to_numpy()
+    movidos = anterior != atual[:n_antigos]
+    refeitos = set(anterior[movidos].tolist()) | set(atual[:n_antigos][movidos].tolist())
+
+    antigos = focos.iloc[:n_antigos]
+    datas_antigas = {c: datas.to_numpy() for c, datas in antigos.groupby("cluster")["data_pas"]}
+    novos = focos.iloc[n_antigos:].groupby("cluster")["data_pas"].agg(["min", "max"])
+
+    janelas = {}
+    for cluster, (primeira, ultima) in novos.iterrows():
+        if cluster in refeitos:
+            continue
+        datas = datas_antigas.get(cluster, np.array([], dtype="datetime64[ns]"))
+        antes = datas[datas <= primeira.to_datetime64()]
+        depois = datas[datas >= ultima.to_datetime64()]
+        janelas[cluster] = (
+            pd.Timestamp(antes.max()) if len(antes) else pd.Timestamp.min,
+            pd.Timestamp(depois.min()) if len(depois) else pd.Timestamp.max,
+        )
+    return refeitos, janelas
+
+
+def append_files(directory, focos_data, manifest, arquivos, novos):
+    """
+    Ingere só os arquivos `novos`: rotula os focos novos, refaz os clusters e gera de novo
+    os registros de não incêndio só dos clusters e janelas de datas afetados. O
+    consolidado_processado recebe os registros novos e perde os não incêndios substituídos.
+    """
+    pasta = os.path.join(directory, PASTA_ESTADO)
+    params = manifest["params"]
+    metodo = manifest.get("metodo", "haversine")
+
+    focos_novos = merge_focos(
+        concatenate_state_csvs(directory, [os.path.join(directory, nome) for nome in novos]), focos_data
+    )
+    focos_novos["target"] = "incendio"
+    focos_novos = apply_schema(focos_novos, "focos_clusterizados")
+
+    focos = read_dataset(dataset_path(pasta, "focos_clusterizados"))
+    n_antigos = len(focos)
+    anterior = focos["cluster"].to_numpy()
+
+    # Os focos novos vão para o fim: as sementes dos clusters antigos continuam as mesmas e
+    # os clusters novos recebem números maiores
+    focos = cluster_by_distance(pd.concat([focos, focos_novos], ignore_index=True), metodo=metodo)
+    refeitos, janelas = changed_windows(focos, n_antigos, anterior)
+
+    nao_incendio = read_dataset(dataset_path(pasta, "nao_incendio"))
+    substituidos = nao_incendio["cluster"].isin(refeitos).to_numpy(copy=True)
+    origem = focos["cluster"].isin(refeitos).to_numpy(copy=True)
+    for cluster, (inicio, fim) in janelas.items():
+        do_cluster = (nao_incendio["cluster"] == cluster).to_numpy()
+        substituidos |= do_cluster & (nao_incendio["data_pas"] > inicio).to_numpy() & (nao_incendio["data_pas"] < fim).to_numpy()
+        origem |= ((focos["cluster"] == cluster) & focos["data_pas"].between(inicio, fim)).to_numpy()
+
+    gerados = apply_schema(generate_nao_incendio(focos[origem]), "nao_incendio")
+    print(
+        f"{len(focos_novos)} foco(s) novo(s), {len(refeitos)} cluster(s) refeito(s), "
+        f"{len(janelas)} janela(s) de datas; {substituidos.sum()} não incêndio(s) substituído(s) "
+        f"por {len(gerados)}"
+    )
+
+    colunas = focos.columns.drop("cluster")
+    processado = read_dataset(dataset_path(directory, "consolidado_processado"))
+    if substituidos.any():
+        # Os registros substituídos são achados no consolidado_processado pelos mesmos valores
+        # normalizados, já que os parâmetros do pré-processamento só mudam na reconstrução
+        removidos = preprocess_dataframe(
+            nao_incendio[substituidos].reindex(columns=colunas), params
+        )[CHAVE_NAO_INCENDIO].drop_duplicates()
+        marcados = processado[CHAVE_NAO_INCENDIO].merge(
+            removidos.assign(_removido=True), on=CHAVE_NAO_INCENDIO, how="left"
+        )["_removido"].notna().to_numpy()
+        processado = processado[~marcados]
+
+    registros_novos = pd.concat([focos_novos, gerados], ignore_index=True).reindex(columns=colunas)
+    if len(registros_novos):
+        processado = pd.concat([processado, preprocess_dataframe(registros_novos, params)], ignore_index=True)
+
+    nao_incendio = pd.concat([nao_incendio[~substituidos], gerados], ignore_index=True)
+    return save_state(
+        directory, focos, nao_incendio, processado, {"arquivos": arquivos, "params": params, "metodo": metodo}
+    )
+
+
+def plan_update(directory, completo=False, metodo=METODO_CLUSTER_PADRAO):
+    """
+    Decide, sem ler os focos, o que a atualização do estado precisa fazer. Retorna
+    (acao, arquivos, manifest, detalhe): acao é "reconstruir", "ingerir" ou None quando não
+    há nada a fazer; detalhe traz os arquivos alterados (reconstruir) ou novos (ingerir).
+    Trocar o método de cluster também reconstrói, já que os clusters salvos mudam.
+    """
+    pasta = os.path.join(directory, PASTA_ESTADO)
+    arquivos = file_hashes(directory)
+    if not arquivos:
+        return None, arquivos, None, []
+
+    manifest = read_manifest(pasta, MANIFESTO) if os.path.exists(os.path.join(pasta, MANIFESTO)) else None
+    estado_salvo = manifest is not None and all(
+        dataset_exists(path) for path in (
+            dataset_path(pasta, "focos_clusterizados"),
+            dataset_path(pasta, "nao_incendio"),
+            dataset_path(directory, "consolidado_processado"),
+        )
+    )
+
+    # Manifestos anteriores à opção foram gerados com o haversine
+    if completo or not estado_salvo or manifest.get("metodo", "haversine") != metodo:
+        return "reconstruir", arquivos, manifest, []
+
+    alterados = [nome for nome, digest in manifest["arquivos"].items() if arquivos.get(nome) != digest]
+    if alterados:
+        return "reconstruir", arquivos, manifest, alterados
+
+    novos = [nome for nome in arquivos if nome not in manifest["arquivos"]]
+    return ("ingerir" if novos else None), arquivos, manifest, novos
+
+
+def update_state(directory, completo=False, metodo=METODO_CLUSTER_PADRAO, focos_data=None):
+    """
+    Atualiza o consolidado e o consolidado_processado do estado com os arquivos do INPE que
+    ainda não foram ingeridos. Reconstrói tudo na primeira execução, com `completo` ou quando
+    um arquivo já ingerido mudou ou sumiu. Os focos são lidos aqui se não vierem em `focos_data`.
+    """
+    acao, arquivos, manifest, detalhe = plan_update(directory, completo, metodo)
+    if not arquivos:
+        print(f"Nenhum arquivo CSV correspondente ao padrão encontrado em {directory}.")
+        return
+    if acao is None:
+        print(f"Nenhum arquivo novo em {directory}.")
+        return
+
+    if focos_data is None:
+        focos_data = process_focos_directory(FOCOS_PATH)
+
+    if acao == "reconstruir":
+        if detalhe:
+            print(f"Arquivos já ingeridos mudaram ou foram removidos ({', '.join(detalhe)}); reconstruindo {directory}...")
+        else:
+            print(f"Reconstruindo {directory}...")
+        return rebuild_state(directory, focos_data, arquivos, metodo)
+
+    print(f"Ingerindo {', '.join(detalhe)} em {directory}...")
+    output_file = append_files(directory, focos_data, manifest, arquivos, detalhe)
+    print(f"Arquivo processado salvo em: {output_file}")
+    return output_file
+
+
+def update_all_states(estados=None, completo=False, jobs=None, metodo=METODO_CLUSTER_PADRAO):
+    """
+    Atualiza os estados da Amazônia Legal (ou só `estados`), `jobs` estados por vez.
+    """
+    tasks = {}
+    for path in AmazoniaLegal.get_paths():
+        sigla = os.path.basename(path)
+        if estados and sigla not in estados:
+            continue
+        directory = os.path.join(BASE_PATH, sigla)
+        if os.path.exists(directory):
+            tasks[sigla] = (directory, completo, metodo)
+        else:
+            print(f"Diretório não encontrado: {directory}")
+
+    # Os focos (todo o histórico) só são lidos se algum estado tiver o que reconstruir ou ingerir
+    focos_data = None
+    if any(plan_update(*args)[0] for args in tasks.values()):
+        print("Processando arquivos de focos...")
+        focos_data = process_focos_directory(FOCOS_PATH)
+    return run_states(update_state, tasks, jobs=jobs, focos_data=focos_data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Atualiza a base de treino só com os arquivos do INPE que ainda não foram ingeridos."
+    )
+    parser.add_argument("--estados", nargs="+", default=None, help="Siglas dos estados (padrão: todos)")
+    parser.add_argument("--completo", action="store_true",
+                        help="Reconstrói tudo e recalcula os parâmetros do pré-processamento")
+    add_metodo_argument(parser)
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
+    results = update_all_states(args.estados, args.completo, args.jobs, args.metodo)
+    sys.exit(1 if any(result["status"] == "erro" for result in results) else 0)
@@ -0,0 +1,323 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "helpers")))
+import argparse
+import time
+from functools import partial
+from graphlib import TopologicalSorter
+from amazonia_legal import AmazoniaLegal
+from dataset_io import dataset_exists, dataset_path, read_dataset, write_dataset
+from state_runner import add_jobs_argument, run_states
+from stage_cache import StageCache, hash_code, hash_files, read_manifest, stage_key, write_manifest
+from unzip_files import unzip_all_in_directory
+from clear_folders import move_csv_to_root
+from clear_dirs import remove_zips_and_empty_dirs
+from concatenar_datasets import concatenate_state_csvs, list_state_csvs
+from add_labels import merge_focos, process_focos_directory
+from data_engineering import METODO_CLUSTER_PADRAO, add_metodo_argument, add_nao_incendio
+from preprocess_data import preprocess_dataframe
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados"))
+FOCOS_PATH = os.path.join(BASE_PATH, "focos")
+CACHE_PATH = os.path.join(BASE_PATH, ".cache")
+CACHE_MAX_MB = float(os.getenv("PIPELINE_CACHE_MB", "2048"))
+
+# Tipos de artefato: "arquivos" ficam no disco da pasta do estado, "dataset" é um DataFrame
+# que pode ser salvo como checkpoint e "global" é carregado uma vez para todos os estados
+ARTEFATOS = {
+    "arquivos_extraidos": "arquivos",
+    "arquivos_organizados": "arquivos",
+    "arquivos_csv": "arquivos",
+    "focos": "global",
+    "consolidado_bruto": "dataset",
+    "consolidado_rotulado": "dataset",
+    "consolidado": "dataset",
+    "consolidado_processado": "dataset",
+}
+
+# Por padrão só o resultado final vai para o disco: uma leitura (CSVs brutos) e uma escrita por estado
+CHECKPOINTS_PADRAO = ("consolidado_processado",)
+
+
+class Stage:
+    def __init__(self, name, func, inputs, output, description, files=None, opcoes=()):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.output = output
+        self.description = description
+        # Arquivos brutos lidos pela etapa, que entram na chave do cache
+        self.files = files
+        # Opções da execução passadas à etapa como argumentos nomeados, que também entram na chave
+        self.opcoes = opcoes
+
+
+# Etapas que só mexem em arquivos recebem a pasta do estado; as demais recebem as entradas
+# na ordem em que foram declaradas
+STAGES = [
+    Stage("unzip_files", unzip_all_in_directory,
+          [], "arquivos_extraidos", "Descompacta os .zip do INPE"),
+    Stage("clear_folders", move_csv_to_root,
+          ["arquivos_extraidos"], "arquivos_organizados", "Move os .csv para a pasta do estado"),
+    Stage("clear_dirs", remove_zips_and_empty_dirs,
+          ["arquivos_organizados"], "arquivos_csv", "Remove os .zip e as pastas vazias"),
+    Stage("concatenar_datasets", concatenate_state_csvs,
+          ["arquivos_csv"], "consolidado_bruto", "Concatena os CSVs anuais e mensais", files=list_state_csvs),
+    Stage("add_labels", merge_focos,
+          ["consolidado_bruto", "focos"], "consolidado_rotulado", "Adiciona dias sem chuva e precipitação"),
+    Stage("data_engineering", add_nao_incendio,
+          ["consolidado_rotulado"], "consolidado", "Gera os registros de não incêndio", opcoes=("metodo",)),
+    Stage("preprocess_data", preprocess_dataframe,
+          ["consolidado"], "consolidado_processado", "Trata faltantes e normaliza"),
+]
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+PRODUCER = {stage.output: stage.name for stage in STAGES}
+
+
+def stage_order():
+    """
+    Etapas em ordem topológica, pelas dependências entre entradas e saídas.
+    """
+    graph = {
+        stage.name: {PRODUCER[artifact] for artifact in stage.inputs if artifact in PRODUCER}
+        for stage in STAGES
+    }
+    return list(TopologicalSorter(graph).static_order())
+
+
+def select_stages(desde=None, ate=None):
+    """
+    Etapas necessárias para produzir a saída de `ate`, começando em `desde`. As entradas
+    das etapas anteriores a `desde` são lidas dos checkpoints (ou dos arquivos) no disco.
+    """
+    order = stage_order()
+    ate = ate or order[-1]
+
+    needed = set()
+    pending = [ate]
+    while pending:
+        name = pending.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        pending.extend(PRODUCER[a] for a in STAGES_BY_NAME[name].inputs if a in PRODUCER)
+
+    if desde is not None:
+        # Só a etapa `desde` e as que dependem dela, direta ou indiretamente
+        downstream = {desde}
+        for name in order:
+            if any(PRODUCER.get(a) in downstream for a in STAGES_BY_NAME[name].inputs):
+                downstream.add(name)
+        needed &= downstream
+
+    return [name for name in order if name in needed]
+
+
+def focos_files():
+    return [os.path.join(FOCOS_PATH, f) for f in os.listdir(FOCOS_PATH) if f.endswith(".csv")]
+
+
+def compute_stage_key(stage, directory, keys, globais, opcoes):
+    """
+    Chave de cache da etapa: hash do código, das chaves das entradas geradas nesta execução,
+    do conteúdo dos checkpoints lidos do disco, dos arquivos brutos e das opções da etapa.
+    """
+    input_keys = {}
+    for artifact in stage.inputs:
+        if artifact in keys:
+            input_keys[artifact] = keys[artifact]
+        elif ARTEFATOS[artifact] == "global":
+            input_keys[artifact] = globais[f"{artifact}_key"]
+        elif ARTEFATOS[artifact] == "dataset":
+            path = dataset_path(directory, artifact)
+            checkpoint = f"{path}.parquet" if os.path.exists(f"{path}.parquet") else f"{path}.csv"
+            input_keys[artifact] = hash_files([checkpoint]) if os.path.exists(checkpoint) else None
+    if stage.files is not None:
+        input_keys["arquivos"] = hash_files(stage.files(directory))
+
+    params = {"estado": os.path.basename(directory), **stage_options(stage, opcoes)}
+    return stage_key(stage.name, hash_code(stage.func, write_dataset), input_keys, params)
+
+
+def stage_options(stage, opcoes):
+    return {name: opcoes[name] for name in stage.opcoes}
+
+
+def predict_misses(directory, stages, cache, globais, opcoes):
+    """
+    Etapas que não devem ser encontradas no cache, calculadas antes de executar. Com .zip
+    ainda por descompactar os arquivos vão mudar, então todas as etapas contam como falta.
+    """
+    if any(name == "unzip_files" for name in stages) and any(
+        file.endswith(".zip") for _, _, files in os.walk(directory) for file in files
+    ):
+        return set(stages)
+
+    manifest = read_manifest(directory)
+    keys, misses = {}, set()
+    for name in stages:
+        stage = STAGES_BY_NAME[name]
+        if ARTEFATOS[stage.output] != "dataset":
+            continue
+        key = compute_stage_key(stage, directory, keys, globais, opcoes)
+        keys[stage.output] = key
+        if manifest["stages"].get(name) != key or not cache.has(key, stage.output):
+            misses.add(name)
+    return misses
+
+
+def _resolve(values, artifact):
+    # Saídas vindas do cache só são lidas quando alguma etapa precisa delas
+    if callable(values[artifact]):
+        values[artifact] = values[artifact]()
+    return values[artifact]
+
+
+def run_state_pipeline(directory, stages, checkpoints, opcoes, cache_dir=None, cache_max_bytes=None, **globais):
+    """
+    Executa as etapas `stages` para a pasta de um estado, passando os DataFrames em memória
+    de uma etapa para a outra e salvando só os artefatos em `checkpoints`. `opcoes` traz as
+    opções da execução ({"metodo": ...}) usadas pelas etapas que as declaram.
+
+    Com `cache_dir`, a saída de cada etapa de dados fica no cache com a chave de
+    `compute_stage_key`, e o manifesto da pasta registra a última chave de cada etapa.
+    Etapas com a mesma chave da última execução não rodam de novo.
+    """
+    sigla = os.path.basename(directory)
+    cache = StageCache(cache_dir, cache_max_bytes) if cache_dir else None
+    manifest = read_manifest(directory) if cache else None
+    values, keys = {}, {}
+
+    for position, name in enumerate(stages):
+        stage = STAGES_BY_NAME[name]
+        started = time.perf_counter()
+
+        key = None
+        if cache and ARTEFATOS[stage.output] == "dataset":
+            key = compute_stage_key(stage, directory, keys, globais, opcoes)
+            keys[stage.output] = key
+
+        if key is not None and manifest["stages"].get(name) == key and cache.has(key, stage.output):
+            values[stage.output] = partial(cache.load, key, stage.output)
+            print(f"[{sigla}] {name}: sem mudanças, usando o cache")
+        else:
+            inputs = []
+            for artifact in stage.inputs:
+                if ARTEFATOS[artifact] == "arquivos":
+                    continue
+                if artifact in values:
+                    inputs.append(_resolve(values, artifact))
+                elif ARTEFATOS[artifact] == "global":
+                    if artifact not in globais:
+                        # Só acontece se a previsão de `predict_misses` errou
+                        globais[artifact] = process_focos_directory(FOCOS_PATH)
+                    inputs.append(globais[artifact])
+                else:
+                    path = dataset_path(directory, artifact)
+                    if not dataset_exists(path):
+                        raise FileNotFoundError(f"Checkpoint {artifact} não encontrado em {path}")
+                    inputs.append(read_dataset(path))
+
+            result = stage.func(*inputs, **stage_options(stage, opcoes)) if inputs else stage.func(directory)
+            if ARTEFATOS[stage.output] == "dataset" and result is None:
+                raise ValueError(f"A etapa {name} não gerou dados em {directory}")
+            values[stage.output] = result
+            if key is not None:
+                cache.store(result, key, stage.output)
+                manifest["stages"][name] = key
+            print(f"[{sigla}] {name}: {time.perf_counter() - started:.2f}s")
+
+        if stage.output in checkpoints:
+            path = dataset_path(directory, stage.output)
+            if key is None or manifest["checkpoints"].get(stage.output) != key or not dataset_exists(path):
+                output_file = write_dataset(_resolve(values, stage.output), path)
+                print(f"[{sigla}] checkpoint salvo em {output_file}")
+                if key is not None:
+                    manifest["checkpoints"][stage.output] = key
+
+        if cache:
+            write_manifest(directory, manifest)
+
+        # Libera o que nenhuma etapa seguinte vai usar
+        remaining = stages[position + 1:]
+        for artifact in list(values):
+            if not any(artifact in STAGES_BY_NAME[later].inputs for later in remaining):
+                del values[artifact]
+
+
+def run_pipeline(estados=None, desde=None, ate=None, checkpoints=CHECKPOINTS_PADRAO, jobs=None,
+                 usar_cache=True, cache_max_mb=CACHE_MAX_MB, metodo=METODO_CLUSTER_PADRAO):
+    stages = select_stages(desde, ate)
+    opcoes = {"metodo": metodo}
+    print(f"Etapas: {' -> '.join(stages)}")
+
+    directories = {}
+    for path in AmazoniaLegal.get_paths():
+        sigla = os.path.basename(path)
+        if estados and sigla not in estados:
+            continue
+        directory = os.path.join(BASE_PATH, sigla)
+        if os.path.exists(directory):
+            directories[sigla] = directory
+        else:
+            print(f"Diretório não encontrado: {directory}")
+
+    cache = StageCache(CACHE_PATH, cache_max_mb * 1024 * 1024) if usar_cache else None
+    globais = {}
+    focos_stages = [name for name in stages if "focos" in STAGES_BY_NAME[name].inputs]
+    if focos_stages:
+        if cache:
+            globais["focos_key"] = hash_files(focos_files())
+        # Com o cache, os focos só são carregados se algum estado for refazer a etapa
+        if not cache or any(
+            set(focos_stages) & predict_misses(directory, stages, cache, globais, opcoes)
+            for directory in directories.values()
+        ):
+            print("Processando arquivos de focos...")
+            globais["focos"] = process_focos_directory(FOCOS_PATH)
+
+    cache_options = {"cache_dir": CACHE_PATH, "cache_max_bytes": cache.max_bytes} if cache else {}
+    tasks = {sigla: (directory, stages, tuple(checkpoints), opcoes) for sigla, directory in directories.items()}
+    results = run_states(run_state_pipeline, tasks, jobs=jobs, **cache_options, **globais)
+
+    if cache:
+        removed = cache.evict()
+        if removed:
+            print(f"Cache: {len(removed)} entrada(s) removida(s) para caber em {cache_max_mb:.0f} MB")
+    return results
+
+
+def print_stages():
+    for name in stage_order():
+        stage = STAGES_BY_NAME[name]
+        inputs = ", ".join(stage.inputs) or "-"
+        print(f"{name:<20} {inputs:<40} -> {stage.output:<24} {stage.description}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera a base de treino executando as etapas do pipeline.")
+    parser.add_argument("--estados", nargs="+", default=None, help="Siglas dos estados (padrão: todos)")
+    parser.add_argument("--desde", choices=[stage.name for stage in STAGES], default=None,
+                        help="Começa nesta etapa, lendo as entradas dos checkpoints")
+    parser.add_argument("--ate", choices=[stage.name for stage in STAGES], default=None,
+                        help="Para depois desta etapa (padrão: a última)")
+    parser.add_argument("--salvar", nargs="+", default=list(CHECKPOINTS_PADRAO),
+                        choices=[name for name, tipo in ARTEFATOS.items() if tipo == "dataset"],
+                        help="Datasets salvos como checkpoint (padrão: consolidado_processado)")
+    parser.add_argument("--sem-cache", action="store_true", help="Executa todas as etapas, sem usar o cache")
+    parser.add_argument("--cache-max-mb", type=float, default=CACHE_MAX_MB,
+                        help="Tamanho máximo do cache em dados/.cache (padrão: PIPELINE_CACHE_MB ou 2048)")
+    parser.add_argument("--listar", action="store_true", help="Lista as etapas e sai")
+    add_metodo_argument(parser)
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
+    if args.listar:
+        print_stages()
+        sys.exit(0)
+
+    results = run_pipeline(
+        args.estados, args.desde, args.ate, args.salvar, args.jobs,
+        usar_cache=not args.sem_cache, cache_max_mb=args.cache_max_mb, metodo=args.metodo,
+    )
+    sys.exit(1 if any(result["status"] == "erro" for result in results) else 0)
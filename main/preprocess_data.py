@@ -1,91 +1,139 @@
 import sys
 import os
+import argparse
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "helpers")))
 from amazonia_legal import AmazoniaLegal
+from dataset_io import dataset_exists, dataset_path, read_dataset, write_dataset
+from state_runner import add_jobs_argument, run_states
 from sklearn.preprocessing import MinMaxScaler
 import pandas as pd
 
 
 
 
-def fill_missing_values(df):
+def fill_missing_values(df, medias=None):
     """
     Preenche valores faltantes nas colunas numéricas com a média dos grupos baseados em
-    `target`, `municipio` e datas semelhantes.
+    `target`, `municipio` e datas semelhantes. O que sobrar recebe a média geral da coluna,
+    ou o valor de `medias` ({coluna: média}), se informado.
     """
-    numeric_columns = df.select_dtypes(include=["float64", "int64"]).columns
+    numeric_columns = list(medias) if medias is not None else df.select_dtypes(include=["float64", "int64"]).columns
+
+    # Agrupamento por target, municipio e data truncada para o nível diário
+    grupos = [df["target"], df["municipio"], df["data_pas"].dt.date]
+    # Linhas com alguma chave vazia ficam fora dos grupos e voltam como faltantes
+    chave_valida = pd.concat(grupos, axis=1).notna().all(axis=1)
 
     for column in numeric_columns:
         if df[column].isna().sum() > 0:
-            # Agrupamento por target, municipio e data truncada para o nível diário
-            df[column] = df.groupby(
-                [df["target"], df["municipio"], df["data_pas"].dt.date]
-            )[column].transform(lambda x: x.fillna(x.mean()))
+            media_grupo = df.groupby(grupos)[column].transform("mean")
+            df[column] = df[column].fillna(media_grupo).where(chave_valida)
 
     # Preenche valores remanescentes com a média geral da coluna
-    df[numeric_columns] = df[numeric_columns].fillna(df[numeric_columns].mean())
+    df[numeric_columns] = df[numeric_columns].fillna(
+        pd.Series(medias) if medias is not None else df[numeric_columns].mean()
+    )
     return df
 
 
-def normalize_data(df):
+def normalize_data(df, params=None):
     """
-    Normaliza as colunas numéricas para a faixa [0, 1] usando Min-Max Scaling.
+    Normaliza as colunas numéricas para a faixa [0, 1] usando Min-Max Scaling. Com `params`
+    (veja `fit_preprocess`), usa o mínimo e o máximo salvos em vez dos do próprio `df`.
     """
-    numeric_columns = df.select_dtypes(include=["float64", "int64"]).columns
-
-    # Normalização com MinMaxScaler
     scaler = MinMaxScaler()
-    df[numeric_columns] = scaler.fit_transform(df[numeric_columns])
+    if params is None:
+        numeric_columns = df.select_dtypes(include=["float64", "int64"]).columns
+        df[numeric_columns] = scaler.fit_transform(df[numeric_columns])
+    else:
+        numeric_columns = list(params["minimo"])
+        # Ajustar só com os extremos dá o mesmo scaler do ajuste com todos os dados
+        scaler.fit(pd.DataFrame([params["minimo"], params["maximo"]], columns=numeric_columns))
+        df[numeric_columns] = scaler.transform(df[numeric_columns])
 
     return df
 
 
-def preprocess_csv(csv_path):
+def fit_preprocess(df):
+    """
+    Processa o consolidado como `preprocess_dataframe` e retorna também as médias e a faixa
+    das colunas numéricas usadas, para processar registros novos depois com os mesmos valores.
+    """
+    df["data_pas"] = pd.to_datetime(df["data_pas"])
+    df = fill_missing_values(df)
+
+    numeric_columns = df.select_dtypes(include=["float64", "int64"]).columns
+    params = {
+        "medias": df[numeric_columns].mean().to_dict(),
+        "minimo": df[numeric_columns].min().to_dict(),
+        "maximo": df[numeric_columns].max().to_dict(),
+    }
+    return preprocess_dataframe(df, params), params
+
+
+def preprocess_dataframe(df, params=None):
     """
-    Processa o arquivo consolidado.csv:
+    Processa o consolidado:
     - Trata valores faltantes.
     - Normaliza os dados numéricos.
     - Remove colunas desnecessárias.
-    """
-    if not os.path.exists(csv_path):
-        print(f"Arquivo não encontrado: {csv_path}")
-        return
 
-    print(f"Processando {csv_path}...")
+    Com `params` (veja `fit_preprocess`), usa as médias e faixas salvas em vez de calculá-las.
+    Os parâmetros usados ficam em `attrs["preprocess_params"]` do resultado, que é salvo junto
+    com o dataset, para o treino e a API normalizarem as entradas do mesmo jeito.
+    """
+    if params is None:
+        return fit_preprocess(df)[0]
 
-    # Carrega os dados
-    df = pd.read_csv(csv_path)
     df["data_pas"] = pd.to_datetime(df["data_pas"])
 
     # Tratamento de valores faltantes
-    df = fill_missing_values(df)
+    df = fill_missing_values(df, params["medias"])
 
     # Normalização dos dados
-    df = normalize_data(df)
+    df = normalize_data(df, params)
 
     # Remoção de colunas desnecessárias
     columns_to_drop = ["estado", "municipio", "foco_id", "id_bdq", "bioma_x", "bioma_y"]
     df = df.drop(columns=[col for col in columns_to_drop if col in df.columns], errors="ignore")
+    df.attrs["preprocess_params"] = params
+    return df
+
 
-    # Salva o arquivo atualizado
-    output_file = os.path.join(os.path.dirname(csv_path), "consolidado_processado.csv")
-    df.to_csv(output_file, index=False)
+def preprocess_csv(path):
+    """
+    Processa o consolidado em `path` (veja `preprocess_dataframe`) e salva o consolidado_processado.
+    """
+    if not dataset_exists(path):
+        print(f"Arquivo não encontrado: {path}")
+        return
+
+    print(f"Processando {path}...")
+
+    # Carrega os dados e salva o arquivo atualizado
+    df = preprocess_dataframe(read_dataset(path))
+    output_file = write_dataset(df, dataset_path(os.path.dirname(path), "consolidado_processado"))
     print(f"Arquivo processado salvo em: {output_file}")
 
 
-def preprocess_all_states():
+def preprocess_all_states(jobs=None):
     """
-    Itera por todas as pastas da Amazônia Legal e processa os arquivos consolidado.csv.
+    Processa os consolidados de todas as pastas da Amazônia Legal, `jobs` estados por vez.
     """
     base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados"))
 
+    tasks = {}
     for path in AmazoniaLegal.get_paths():
-        relative_path = os.path.join(base_path, os.path.basename(path), "consolidado.csv")
-        if os.path.exists(relative_path):
-            preprocess_csv(relative_path)
+        relative_path = dataset_path(os.path.join(base_path, os.path.basename(path)), "consolidado")
+        if dataset_exists(relative_path):
+            tasks[os.path.basename(path)] = (relative_path,)
         else:
-            print(f"Arquivo consolidado.csv não encontrado em: {relative_path}")
+            print(f"Consolidado não encontrado em: {relative_path}")
+
+    return run_states(preprocess_csv, tasks, jobs=jobs)
 
 
 if __name__ == "__main__":
-    preprocess_all_states()
\ No newline at end of file
+    args = add_jobs_argument(argparse.ArgumentParser(description="Pré-processa os consolidados.")).parse_args()
+    results = preprocess_all_states(jobs=args.jobs)
+    sys.exit(1 if any(result["status"] == "erro" for result in results) else 0)
\ No newline at end of file
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Os scripts de main/ importam os módulos de helpers/ e uns dos outros pelo nome
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, os.path.join(RAIZ, "main"))
+sys.path.insert(0, os.path.join(RAIZ, "helpers"))
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.spatial import cKDTree
+
+from data_engineering import cluster_by_distance, generate_nao_incendio
+
+
+# Implementações originais (antes da vetorização), usadas como referência
+
+
+def cluster_by_distance_original(df, max_distance_km=100):
+    coords = np.array([(row.lat, row.lon) for _, row in df.iterrows()])
+    tree = cKDTree(coords)
+    clusters = tree.query_ball_tree(tree, max_distance_km / 110.574)  # 1° ≈ 110.574 km
+
+    cluster_ids = [-1] * len(df)
+    cluster_counter = 0
+    for i, points in enumerate(clusters):
+        if cluster_ids[i] == -1:
+            for p in points:
+                cluster_ids[p] = cluster_counter
+            cluster_counter += 1
+
+    df["cluster"] = cluster_ids
+    return df
+
+
+def generate_nao_incendio_original(df):
+    nao_incendio_rows = []
+    for cluster_id, group in df.groupby("cluster"):
+        group = group.sort_values(by="data_pas")
+        group["data_pas"] = pd.to_datetime(group["data_pas"])
+
+        for i in range(len(group) - 1):
+            current_row = group.iloc[i]
+            next_row = group.iloc[i + 1]
+            interval_start = current_row["data_pas"]
+            interval_end = next_row["data_pas"]
+
+            if interval_end - interval_start > timedelta(days=1):
+                midpoint_lat = (current_row["lat"] + next_row["lat"]) / 2
+                midpoint_lon = (current_row["lon"] + next_row["lon"]) / 2
+                current_date = interval_start + timedelta(days=1)
+                while current_date < interval_end:
+                    nao_incendio_rows.append({
+                        "lat": midpoint_lat,
+                        "lon": midpoint_lon,
+                        "data_pas": current_date,
+                        "target": "não_incendio"
+                    })
+                    current_date += timedelta(days=1)
+
+    return pd.DataFrame(nao_incendio_rows)
+
+
+@pytest.fixture
+def focos():
+    """
+    Focos de dois grupos distantes com empates de data e de posição, datas ausentes e
+    intervalos de exatamente um dia, de um dia e um segundo, de exatamente três dias e
+    de vários dias e algumas horas.
+    """
+    return pd.DataFrame({
+        "lat": [-3.10, -3.10, -3.50, -3.20, -3.15, -3.40, -3.30, -10.00, -10.20, -10.10, -10.00, -3.25],
+        "lon": [-60.00, -60.00, -60.40, -60.10, -60.20, -60.30, -60.50, -55.00, -55.10, -55.20, -55.00, -60.05],
+        "data_pas": pd.to_datetime([
+            "2024-08-01 13:00", "2024-08-01 13:00", "2024-08-02 13:00", "2024-08-06 09:30",
+            None, "2024-08-06 09:30", "2024-08-07 09:30:01", "2024-08-01 00:00",
+            "2024-08-02 00:00", "2024-08-02 00:00:01", "2024-08-05 00:00:01", None,
+        ], format="ISO8601"),
+    })
+
+
+def test_cluster_by_distance_matches_original(focos):
+    esperado = cluster_by_distance_original(focos.copy())["cluster"].to_numpy()
+    resultado = cluster_by_distance(focos.copy(), metodo="graus")["cluster"].to_numpy()
+
+    np.testing.assert_array_equal(resultado, esperado)
+    assert len(set(esperado)) > 1
+
+
+@pytest.mark.parametrize("raio", [1, 30, 100])
+def test_cluster_by_distance_matches_original_for_radius(focos, raio):
+    esperado = cluster_by_distance_original(focos.copy(), raio)["cluster"].to_numpy()
+    resultado = cluster_by_distance(focos.copy(), raio, metodo="graus")["cluster"].to_numpy()
+
+    np.testing.assert_array_equal(resultado, esperado)
+
+
+def test_generate_nao_incendio_matches_original(focos):
+    focos = cluster_by_distance_original(focos)
+    esperado = generate_nao_incendio_original(focos)
+    resultado = generate_nao_incendio(focos)
+
+    assert len(esperado) > 0
+    pd.testing.assert_frame_equal(resultado.drop(columns=["cluster"]), esperado, check_exact=True)
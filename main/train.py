@@ -1,4 +1,5 @@
 import os
+import json
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from xgboost import XGBClassifier
@@ -12,7 +13,10 @@ from skl2onnx import convert_sklearn
 from skl2onnx.common.data_types import FloatTensorType
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "helpers")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "api")))
 from amazonia_legal import AmazoniaLegal
+from dataset_io import dataset_exists, dataset_path, read_dataset
+from dependencies.model import Model
 
 
 def preprocess_data(df):
@@ -58,7 +62,8 @@ def temporal_train_test_split(df, date_column, test_ratio=0.3):
 
 def save_model(model, model_name, results_dir, X_train):
     """
-    Salva o modelo em formatos .pkl (Python) e .onnx (JavaScript).
+    Salva o modelo em formatos .pkl (Python) e .onnx (JavaScript). O .onnx só é mantido se
+    classificar `X_train` exatamente como o .pkl.
     """
     model_dir = os.path.join(results_dir, model_name)
     os.makedirs(model_dir, exist_ok=True)
@@ -76,6 +81,15 @@ def save_model(model, model_name, results_dir, X_train):
         with open(onnx_path, "wb") as f:
             f.write(onnx_model.SerializeToString())
         print(f"Modelo salvo em formato ONNX: {onnx_path}")
+
+        parity = Model.check_parity(pkl_path, onnx_path, X_train)
+        if parity["mismatches"]:
+            os.remove(onnx_path)
+            raise ValueError(
+                f"{parity['mismatches']} de {parity['rows']} previsões do ONNX diferem do .pkl; {onnx_path} removido"
+            )
+        print(f"Previsões do ONNX iguais às do .pkl em {parity['rows']} linhas "
+              f"({parity['onnx_ms']} ms contra {parity['pickle_ms']} ms)")
     except Exception as e:
         print(f"Erro ao converter o modelo {model_name} para ONNX: {e}")
 
@@ -142,18 +156,39 @@ def save_results(results_dir, model_name, cm, report):
     print(f"Métricas salvas em: {excel_path}")
 
 
+def save_preprocess_params(params, results_dir):
+    """
+    Salva os parâmetros do pré-processamento de cada estado usados no treino, para a API
+    normalizar as entradas do modelo com os mesmos valores.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    params_path = os.path.join(results_dir, "preprocess_params.json")
+    with open(params_path, "w", encoding="utf-8") as f:
+        json.dump({"estados": params}, f, ensure_ascii=False, indent=2)
+    print(f"Parâmetros do pré-processamento salvos em: {params_path}")
+
+
 def main():
     base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dados"))
+    results_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "results"))
 
     dfs = []
+    params = {}
     for path in AmazoniaLegal.get_paths():
-        csv_path = os.path.join(base_path, os.path.basename(path), "consolidado_processado.csv")
-        if os.path.exists(csv_path):
-            dfs.append(pd.read_csv(csv_path))
+        sigla = os.path.basename(path)
+        processado_path = dataset_path(os.path.join(base_path, sigla), "consolidado_processado")
+        if dataset_exists(processado_path):
+            df = read_dataset(processado_path)
+            if "preprocess_params" in df.attrs:
+                params[sigla] = df.attrs["preprocess_params"]
+            else:
+                print(f"Parâmetros do pré-processamento ausentes em {processado_path}; processe o estado de novo.")
+            dfs.append(df)
         else:
-            print(f"Arquivo não encontrado: {csv_path}")
+            print(f"Arquivo não encontrado: {processado_path}")
 
     full_df = pd.concat(dfs, ignore_index=True)
+    save_preprocess_params(params, results_dir)
 
     full_df, X, y = preprocess_data(full_df)
     X_train, X_test, y_train, y_test = temporal_train_test_split(full_df, "data_pas")